@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-30 15:02:17
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-30 15:02:17
+
+"""
+Micro-benchmarks of the hot paths of the bot, on synthetic data.
+
+Run from the root of the repository:
+    python -m benchmarks                    # compare with the baseline
+    python -m benchmarks --update-baseline  # record a new baseline
+"""
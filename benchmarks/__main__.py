@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-30 15:02:17
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-30 15:02:17
+
+"""Command line of the benchmarks"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict
+
+from . import suite
+
+BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        "baseline.json")
+
+
+def _print(name: str, result: Dict[str, float]) -> None:
+    print(f"{name:<40} {result['median'] * 1e6:>14.2f} us "
+          f"(min {result['min'] * 1e6:.2f} us, x{result['number']})",
+          flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description=__doc__)
+    parser.add_argument("-k", dest="pattern", default=None,
+                        help="only run the benchmarks containing PATTERN")
+    parser.add_argument("--quick", action="store_true",
+                        help="skip the trees of 100k keys")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimal duration of a sample, in seconds")
+    parser.add_argument("--output", default=None,
+                        help="file where the results are written, as JSON")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="accepted slow down, 0.3 for 30%%")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="write the results to the baseline")
+    args = parser.parse_args()
+
+    sizes = suite.SIZES[:-1] if args.quick else suite.SIZES
+    results = suite.run(sizes, args.pattern, args.repeat, args.min_time,
+                        _print)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as file:
+                baseline = json.load(file)
+        baseline.update({key: value for key, value in results.items()
+                         if key != "results"})
+        baseline["results"].update(results["results"])
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}.", file=sys.stderr)
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions = suite.compare(results, baseline, args.threshold)
+    for name, reference, median in regressions:
+        print(f"Regression of {name}: {reference * 1e6:.2f} us -> "
+              f"{median * 1e6:.2f} us (+{median / reference - 1:.0%})",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
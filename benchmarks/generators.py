@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-30 15:02:17
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-30 15:02:17
+
+"""Generators of the synthetic data of the benchmarks, deterministic"""
+
+import base64
+import random
+from typing import Dict, List, Union
+
+from src.ssh_keys import KeyMode, SshKey, SshKeyDict
+
+
+def key_line(rng: random.Random) -> str:
+    """
+    Generates the line of a ssh key, as found in authorized_keys
+
+    :param      rng:  The random generator
+    :type       rng:  random.Random
+
+    :returns:   The line
+    :rtype:     str
+    """
+    mode = rng.choice(list(KeyMode))
+    key = base64.b64encode(rng.randbytes(68)).decode("ascii")
+    return f"{mode} {key} user{rng.randrange(1000)}@host{rng.randrange(100)}"
+
+
+def key_names(size: int, depth: int, fanout: int = 10) -> List[str]:
+    """
+    Generates the names of the keys of a tree
+
+    :param      size:    The number of keys
+    :type       size:    int
+    :param      depth:   The number of groups above each key
+    :type       depth:   int
+    :param      fanout:  The number of groups in each group
+    :type       fanout:  int
+
+    :returns:   The names, "group0/.../key"
+    :rtype:     List[str]
+    """
+    names = []
+    for i in range(size):
+        groups = []
+        rest = i
+        for level in range(depth):
+            groups.append(f"g{level}-{rest % fanout}")
+            rest //= fanout
+        names.append("/".join(groups + [f"key{i}"]))
+    return names
+
+
+def tree(size: int, depth: int, seed: int = 0) -> SshKeyDict:
+    """
+    Generates a tree of keys
+
+    :param      size:   The number of keys
+    :type       size:   int
+    :param      depth:  The number of groups above each key
+    :type       depth:  int
+    :param      seed:   The seed
+    :type       seed:   int
+
+    :returns:   The tree
+    :rtype:     SshKeyDict
+    """
+    rng = random.Random(seed)
+    result = SshKeyDict({})
+    for name in key_names(size, depth):
+        node = result
+        *groups, leaf = name.split("/")
+        for group in groups:
+            if group not in node:
+                node[group] = SshKeyDict({})
+            node = node[group]
+        node[leaf] = SshKey.convert(key_line(rng))
+    return result
+
+
+def config(depth: int, width: int) -> Dict[str, Union[dict, str]]:
+    """
+    Generates the content of a config file
+
+    :param      depth:  The depth of the deepest key
+    :type       depth:  int
+    :param      width:  The number of keys in each section
+    :type       width:  int
+
+    :returns:   The content, whose deepest key is "s0.s0. ... .k0"
+    :rtype:     Dict[str, Union[dict, str]]
+    """
+    if depth <= 1:
+        return {f"k{i}": f"value{i}" for i in range(width)}
+    content: Dict[str, Union[dict, str]] = {
+        f"s{i}": config(depth - 1, width) if i == 0 else {"k0": "value"}
+        for i in range(width)}
+    content.update({f"k{i}": f"value{i}" for i in range(width)})
+    return content
+
+
+def log(size: int, seed: int = 0) -> str:
+    """
+    Generates a log message, with long lines and code blocks
+
+    :param      size:  The approximative number of characters
+    :type       size:  int
+    :param      seed:  The seed
+    :type       seed:  int
+
+    :returns:   The message
+    :rtype:     str
+    """
+    rng = random.Random(seed)
+    words = ["error", "disk", "backup", "done", "failed", "retry", "/var/log",
+             "0x7f3a", "timeout", "ok"]
+    parts = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.1:
+            lines = [" ".join(rng.choices(words, k=rng.randrange(3, 15)))
+                     for _ in range(rng.randrange(5, 60))]
+            part = "```py\n" + "\n".join(lines) + "\n```"
+        elif kind < 0.15:
+            # A line longer than a discord message
+            part = "".join(rng.choices("abcdef0123456789", k=5000))
+        else:
+            part = " ".join(rng.choices(words, k=rng.randrange(3, 30)))
+        parts.append(part)
+        length += len(part) + 1
+    return "\n".join(parts)
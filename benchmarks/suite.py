@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-30 15:02:17
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-30 15:02:17
+
+"""Module defining, running and comparing the benchmarks"""
+
+import gc
+import itertools
+import os
+import platform
+import statistics
+import tempfile
+from functools import lru_cache
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from src.commands.message import Message
+from src.config import Config
+from src.ssh_keys import SshKey, SshKeyDict
+
+from . import generators
+
+# A case runs its operation a number of times and returns the elapsed time,
+# its setup is not timed
+Case = Callable[[int], float]
+
+SIZES = (100, 10_000, 100_000)
+DEPTHS = (1, 3)
+# Keys of the operations of the tree changed by diff
+DIFF_RATIO = 0.01
+
+
+def _timed(operation: Callable[[], object], number: int) -> float:
+    start = perf_counter()
+    for _ in range(number):
+        operation()
+    return perf_counter() - start
+
+
+@lru_cache(maxsize=None)
+def _directory() -> str:
+    return tempfile.mkdtemp(prefix="discord-bot-benchmarks-")
+
+
+@lru_cache(maxsize=4)
+def _tree_file(size: int, depth: int) -> str:
+    path = os.path.join(_directory(), f"authorized_key-{size}-{depth}")
+    generators.tree(size, depth).write(path)
+    return path
+
+
+def _config(depth: int) -> Config:
+    path = os.path.join(_directory(), f"config-{depth}.yml")
+    with open(path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(generators.config(depth, 8), file)
+    return Config(path)
+
+
+def _config_case(depth: int, action: str) -> Case:
+    config = _config(depth)
+    key = ".".join(["s0"] * (depth - 1) + ["k0"])
+    if action == "get":
+        return lambda number: _timed(lambda: config.get(key), number)
+    if action == "set":
+        return lambda number: _timed(lambda: config.set(key, "value"),
+                                     number)
+    missing = ".".join(["s0"] * (depth - 1) + ["missing"])
+    return lambda number: _timed(lambda: key in config
+                                 and missing in config, number)
+
+
+def _open_case(size: int, depth: int) -> Case:
+    path = _tree_file(size, depth)
+    return lambda number: _timed(lambda: SshKeyDict.open(path), number)
+
+
+def _write_case(size: int, depth: int) -> Case:
+    tree = generators.tree(size, depth)
+    path = os.path.join(_directory(), "written")
+    return lambda number: _timed(lambda: tree.write(path), number)
+
+
+def _list_key_case(size: int, depth: int) -> Case:
+    tree = generators.tree(size, depth)
+    return lambda number: _timed(tree.list_key, number)
+
+
+def _diff_case(size: int, depth: int) -> Case:
+    old = generators.tree(size, depth)
+    new = generators.tree(size, depth)
+    names = generators.key_names(size, depth)
+    changed = max(1, int(size * DIFF_RATIO))
+    for name in names[:changed]:
+        new.remove(name)
+    addition = generators.tree(changed, depth + 1, seed=1)
+    new.add(addition)
+    return lambda number: _timed(lambda: new.diff(old), number)
+
+
+def _additions(depth: int, number: int, start: int) -> List[SshKeyDict]:
+    additions = []
+    for name in generators.key_names(number, depth):
+        *groups, leaf = name.split("/")
+        addition = SshKeyDict({})
+        node = addition
+        for group in groups:
+            node[group] = SshKeyDict({})
+            node = node[group]
+        node[f"new{start}-{leaf}"] = SshKey.convert(
+            "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIBenchmark bench@host")
+        additions.append(addition)
+    return additions
+
+
+def _add_case(size: int, depth: int) -> Case:
+    tree = generators.tree(size, depth)
+    counter = itertools.count()
+
+    def case(number: int) -> float:
+        additions = iter(_additions(depth, number, next(counter)))
+        return _timed(lambda: tree.add(next(additions)), number)
+    return case
+
+
+def _remove_case(size: int, depth: int) -> Case:
+    tree = generators.tree(size, depth)
+    counter = itertools.count()
+
+    def case(number: int) -> float:
+        additions = _additions(depth, number, next(counter))
+        names = []
+        for addition in additions:
+            tree.add(addition)
+            names.extend(addition.list_key())
+        removed = iter(names)
+        return _timed(lambda: tree.remove(next(removed)), number)
+    return case
+
+
+def _convert_case() -> Case:
+    rng = generators.random.Random(0)
+    lines = itertools.cycle([generators.key_line(rng) for _ in range(1000)])
+    return lambda number: _timed(lambda: SshKey.convert(next(lines)), number)
+
+
+def _message_case(size: int) -> Case:
+    content = generators.log(size)
+
+    def split() -> None:
+        for _ in Message(content).chunks():
+            pass
+    return lambda number: _timed(split, number)
+
+
+def cases(sizes: Iterable[int] = SIZES) -> Dict[str, Callable[[], Case]]:
+    """
+    The benchmarks, built lazily
+
+    :param      sizes:  The numbers of keys of the trees
+    :type       sizes:  Iterable[int]
+
+    :returns:   The builders of the cases, by name
+    :rtype:     Dict[str, Callable[[], Case]]
+    """
+    result: Dict[str, Callable[[], Case]] = {}
+    for depth, name in ((1, "shallow"), (8, "deep")):
+        for action in ("get", "set", "contains"):
+            result[f"config.{action}[{name}]"] = \
+                lambda depth=depth, action=action: _config_case(depth, action)
+    operations = {"open": _open_case,
+                  "write": _write_case,
+                  "diff": _diff_case,
+                  "list_key": _list_key_case,
+                  "add": _add_case,
+                  "remove": _remove_case}
+    for size in sizes:
+        for depth in DEPTHS:
+            for name, builder in operations.items():
+                result[f"ssh_keys.{name}[{size},depth={depth}]"] = \
+                    lambda builder=builder, size=size, depth=depth: \
+                    builder(size, depth)
+    result["ssh_key.convert"] = _convert_case
+    for size in (10_000, 1_000_000):
+        result[f"message.chunks[{size}]"] = \
+            lambda size=size: _message_case(size)
+    return result
+
+
+def measure(case: Case, repeat: int = 5, min_time: float = 0.2
+            ) -> Dict[str, float]:
+    """
+    Measures the time of an operation
+
+    :param      case:      The case
+    :type       case:      Case
+    :param      repeat:    The number of samples
+    :type       repeat:    int
+    :param      min_time:  The minimal duration of a sample, in seconds
+    :type       min_time:  float
+
+    :returns:   The median and the minimum, in seconds per operation, and
+                the number of operations per sample
+    :rtype:     Dict[str, float]
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        elapsed = case(1)
+        number = max(1, min(100_000, int(min_time / max(elapsed, 1e-9))))
+        samples = [case(number) / number for _ in range(repeat)]
+    finally:
+        if enabled:
+            gc.enable()
+    return {"median": statistics.median(samples),
+            "min": min(samples),
+            "number": number}
+
+
+def run(sizes: Iterable[int] = SIZES, pattern: Optional[str] = None,
+        repeat: int = 5, min_time: float = 0.2,
+        progress: Optional[Callable[[str, Dict[str, float]], None]] = None
+        ) -> dict:
+    """
+    Runs the benchmarks
+
+    :param      sizes:     The numbers of keys of the trees
+    :type       sizes:     Iterable[int]
+    :param      pattern:   Only runs the benchmarks whose name contains it
+    :type       pattern:   Optional[str]
+    :param      repeat:    The number of samples
+    :type       repeat:    int
+    :param      min_time:  The minimal duration of a sample, in seconds
+    :type       min_time:  float
+    :param      progress:  Called with the result of each benchmark
+    :type       progress:  Optional[Callable[[str, Dict[str, float]], None]]
+
+    :returns:   The results, with a description of the machine
+    :rtype:     dict
+    """
+    results = {}
+    for name, builder in cases(sizes).items():
+        if pattern is not None and pattern not in name:
+            continue
+        results[name] = measure(builder(), repeat, min_time)
+        if progress is not None:
+            progress(name, results[name])
+    return {"python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results}
+
+
+def compare(results: dict, baseline: dict, threshold: float
+            ) -> List[Tuple[str, float, float]]:
+    """
+    Finds the regressions
+
+    :param      results:    The results
+    :type       results:    dict
+    :param      baseline:   The results of reference
+    :type       baseline:   dict
+    :param      threshold:  The accepted slow down, 0.25 for 25%
+    :type       threshold:  float
+
+    :returns:   The name, the baseline and the new median of each benchmark
+                slower than the baseline by more than the threshold
+    :rtype:     List[Tuple[str, float, float]]
+    """
+    regressions = []
+    for name, result in results["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        if result["median"] > reference["median"] * (1 + threshold):
+            regressions.append((name, reference["median"], result["median"]))
+    return regressions
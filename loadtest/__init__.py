@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-31 09:47:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-31 09:47:33
+
+"""
+End-to-end load test of the bot, against an in-process stand-in of discord
+and the reference ssh-maintainer.
+
+Run from the root of the repository:
+    python -m loadtest --producers 8 --messages 100 --commands 40
+"""
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-31 09:47:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-31 09:47:33
+
+"""Command line of the load test"""
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from . import harness
+
+
+def _rate_limit(value: str) -> Optional[Tuple[int, float]]:
+    if value in ("", "0", "none"):
+        return None
+    sends, period = value.split("/")
+    return int(sends), float(period)
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f} ms"
+
+
+def _print(report: Dict[str, Any]) -> None:
+    messages = report["messages"]
+    print(f"Messages: {messages['delivered']}/{messages['produced']} "
+          f"delivered ({messages['lost']} lost, {messages['sends']} sends), "
+          f"{messages['per_second']:.1f} msg/s")
+    print(f"Ingest to send: p50 {_ms(messages['p50'])}, "
+          f"p99 {_ms(messages['p99'])}, max {_ms(messages['max'])}")
+    rate_limits = report["rate_limits"]
+    print(f"Rate limits: {rate_limits['stalls']} stalls, "
+          f"{rate_limits['stalled']:.1f}s stalled "
+          f"({rate_limits['counted_by_bot']:.0f} counted by the bot)")
+    for step, result in report["commands"].items():
+        print(f"/{step:<8} x{result['count']:<4} "
+              f"ack p50 {_ms(result['ack_p50'])}, "
+              f"p99 {_ms(result['ack_p99'])}; "
+              f"done p50 {_ms(result['completed_p50'])}, "
+              f"p99 {_ms(result['completed_p99'])}; "
+              f"{result['late']} late, {result['unanswered']} unanswered")
+    for error in report.get("errors", []):
+        print(f"Producer error: {error}", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest",
+                                     description=__doc__)
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=25,
+                        help="messages sent by each producer")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="messages per second of each producer, "
+                        "0 for as fast as possible")
+    parser.add_argument("--size", type=int, default=200,
+                        help="characters of each message")
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2,
+                        help="slash commands run at once")
+    parser.add_argument("--rate-limit", type=_rate_limit, default=(5, 5.0),
+                        help="sends allowed per channel, as SENDS/SECONDS, "
+                        "or none")
+    parser.add_argument("--no-mirror", action="store_true",
+                        help="ask ssh-maintainer for the keys on each "
+                        "command")
+    parser.add_argument("--commit-interval", type=float, default=0.05,
+                        help="commit interval of ssh-maintainer")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--json", default=None,
+                        help="file where the report is written")
+    args = parser.parse_args()
+
+    report = asyncio.run(harness.run(
+        args.producers, args.messages, args.rate, args.size, args.commands,
+        args.concurrency, args.rate_limit, not args.no_mirror,
+        args.commit_interval, args.drain_timeout))
+    _print(report)
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return 0 if report["messages"]["lost"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-31 09:47:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-31 09:47:33
+
+"""Scripted slash commands, invoked as discord would"""
+
+import asyncio
+import itertools
+import random
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from discord.ui import Button, View
+
+from benchmarks.generators import key_line
+from src.bot import Bot
+from src.commands.ssh import Ssh
+
+from .fake_discord import FakeMember
+
+# Discord cancels the interactions not acknowledged within this delay
+INTERACTION_DEADLINE = 3.0
+# Delay given to the error handlers, run as events, to answer
+ANSWER_TIMEOUT = 10.0
+
+
+class FakeResponse:
+    """
+    Stand-in of the InteractionResponse of an interaction
+    """
+
+    def __init__(self, ctx: "FakeContext"):
+        self._ctx = ctx
+
+    def is_done(self) -> bool:
+        return self._ctx.acknowledged is not None
+
+    async def defer(self, **_) -> None:
+        self._ctx.acknowledge()
+
+    async def send_message(self, content: Optional[str] = None,
+                           **kwargs) -> None:
+        self._ctx.record(content, kwargs)
+
+    async def edit_message(self, **kwargs) -> None:
+        self._ctx.record(None, kwargs)
+
+
+class FakeFollowup:
+    """
+    Stand-in of the webhook of the followup messages of an interaction
+    """
+    # pylint: disable=R0903
+
+    def __init__(self, ctx: "FakeContext"):
+        self._ctx = ctx
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        self._ctx.record(content, kwargs)
+
+
+class FakeInteraction:
+    # pylint: disable=R0903
+    _ids = itertools.count(1)
+
+    def __init__(self, ctx: "FakeContext", data: Dict[str, Any]):
+        self.id = next(self._ids)
+        self.data = data
+        self.response = FakeResponse(ctx)
+        self.followup = FakeFollowup(ctx)
+
+
+class FakeContext:
+    """
+    Stand-in of the ApplicationContext of a slash command, recording the
+    answers of the bot
+    """
+    # pylint: disable=R0902
+
+    def __init__(self, bot: Bot, command: Ssh, author: FakeMember,
+                 data: Dict[str, Any]):
+        self.bot = bot
+        self.command = command
+        self.author = author
+        self.user = author
+        self.guild = author.guild
+        self.interaction = FakeInteraction(self, data)
+        self.response = self.interaction.response
+        self.followup = self.interaction.followup
+        self.cog = None
+        self.command_failed = False
+        self.start = perf_counter()
+        self.acknowledged: Optional[float] = None
+        self.answers: List[Tuple[float, Optional[str], Dict[str, Any]]] = []
+        self.answered = asyncio.Event()
+
+    def acknowledge(self) -> None:
+        if self.acknowledged is None:
+            self.acknowledged = perf_counter()
+
+    def record(self, content: Optional[str], kwargs: Dict[str, Any]) -> None:
+        self.acknowledge()
+        self.answers.append((perf_counter(), content, kwargs))
+        self.answered.set()
+
+    async def defer(self, **_) -> None:
+        self.acknowledge()
+
+    async def respond(self, content: Optional[str] = None, **kwargs) -> None:
+        self.record(content, kwargs)
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        self.record(content, kwargs)
+
+    def view(self) -> Optional[View]:
+        for _, _, kwargs in self.answers:
+            if isinstance(kwargs.get("view"), View):
+                return kwargs["view"]
+        return None
+
+
+class CommandScript:
+    """
+    Class invoking the ssh commands in a loop: adding a key, listing the
+    keys, replacing a key, deleting a key and listing without the permission
+    """
+    # pylint: disable=R0902
+    STEPS = ("add", "list", "replace", "del", "denied")
+
+    def __init__(self, bot: Bot, members: Dict[str, FakeMember],
+                 commands: int, concurrency: int = 1, seed: int = 0):
+        # pylint: disable=R0913
+        self._bot = bot
+        self._members = members
+        self._commands = commands
+        self._concurrency = concurrency
+        self._rng = random.Random(seed)
+        self._counter = itertools.count()
+        self._keys: List[str] = []
+        self.results: List[Dict[str, Any]] = []
+
+    def _group(self) -> Ssh:
+        # The extension is loaded as a module of its own, its classes are
+        # not the ones imported here
+        return next(command for command in
+                    self._bot.pending_application_commands
+                    if command.name == "ssh-key")
+
+    def _next(self) -> Tuple[str, FakeMember, Dict[str, Any]]:
+        index = next(self._counter)
+        step = self.STEPS[index % len(self.STEPS)]
+        if step in ("replace", "del") and not self._keys:
+            step = "add"
+        admin = self._members["admin"]
+        if step == "add":
+            name = f"load/key{index}"
+            self._keys.append(name)
+            return step, admin, {"name": "add", "options": [
+                {"name": "key_name", "value": name},
+                {"name": "key", "value": key_line(self._rng)}]}
+        if step == "replace":
+            return step, admin, {"name": "add", "options": [
+                {"name": "key_name", "value": self._keys[-1]},
+                {"name": "key", "value": key_line(self._rng)}]}
+        if step == "del":
+            return step, admin, {"name": "del", "options": [
+                {"name": "key_name", "value": self._keys.pop(0)}]}
+        author = self._members["guest"] if step == "denied" else admin
+        return step, author, {"name": "list", "options": [
+            {"name": "prefix", "value": "load/"}]}
+
+    async def _invoke(self, step: str, author: FakeMember,
+                      option: Dict[str, Any]) -> None:
+        ctx = FakeContext(self._bot, self._group(), author,
+                          {"options": [option]})
+        await self._bot.invoke_application_command(ctx)  # type: ignore
+        try:
+            await asyncio.wait_for(ctx.answered.wait(), ANSWER_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        view = ctx.view()
+        if step in ("replace", "del") and view is not None:
+            # The author confirms
+            button = next(item for item in view.children
+                          if isinstance(item, Button) and item.label == "Yes")
+            await button.callback(ctx.interaction)  # type: ignore
+        end = ctx.answers[-1][0] if ctx.answers else perf_counter()
+        self.results.append({
+            "step": step,
+            "acknowledged": (None if ctx.acknowledged is None
+                             else ctx.acknowledged - ctx.start),
+            "completed": end - ctx.start,
+            "answers": len(ctx.answers)})
+
+    async def _worker(self, remaining: List[int]) -> None:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            await self._invoke(*self._next())
+
+    async def run(self) -> None:
+        """
+        Invokes the commands
+
+        :returns:   None
+        :rtype:     None
+        """
+        remaining = [self._commands]
+        await asyncio.gather(*(self._worker(remaining)
+                               for _ in range(self._concurrency)))
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-31 09:47:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-31 09:47:33
+
+"""
+Stand-in of discord: a guild with channels, members and roles, whose
+channels record what is sent on them and apply the rate limits of discord.
+"""
+
+import asyncio
+import logging
+import re
+from collections import deque
+from time import perf_counter
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from discord import Guild, Member, TextChannel
+
+# Sends per channel allowed by discord in each period
+RATE_LIMIT = (5, 5.0)
+# Marker of the messages of the producers, with the id of the message
+MARKER = re.compile(r"load (\d+-\d+)")
+
+
+class FakeRole:
+    # pylint: disable=R0903
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+
+
+class FakeGuild(Guild):
+    """
+    Guild whose roles are given, get_role is the one of discord
+    """
+    # pylint: disable=W0231
+
+    def __init__(self, guild_id: int, roles: List[FakeRole]):
+        self.id = guild_id
+        self._roles = {role.id: role for role in roles}   # type: ignore
+
+    def __repr__(self) -> str:
+        return f"<FakeGuild id={self.id}>"
+
+
+class FakeMember(Member):
+    """
+    Member whose roles are given
+    """
+    # pylint: disable=W0231
+
+    def __init__(self, member_id: int, name: str, guild: FakeGuild,
+                 roles: List[FakeRole]):
+        self.guild = guild
+        self._fake = (member_id, name, roles)
+
+    id = property(lambda self: self._fake[0])           # type: ignore
+    name = property(lambda self: self._fake[1])         # type: ignore
+    roles = property(lambda self: self._fake[2])        # type: ignore
+
+    def __repr__(self) -> str:
+        return f"<FakeMember id={self.id} name={self.name}>"
+
+
+class FakeChannel(TextChannel):
+    """
+    Text channel recording the messages sent on it
+    """
+    # pylint: disable=W0231
+
+    def __init__(self, discord: "FakeDiscord", channel_id: int, name: str):
+        self.id = channel_id
+        self.name = name
+        self.guild = discord.guild
+        self._discord = discord
+
+    def __repr__(self) -> str:
+        return f"<FakeChannel id={self.id} name={self.name}>"
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        # pylint: disable=W0221
+        await self._discord.rate_limit(self.id)
+        self._discord.record(self.id, content, kwargs)
+
+
+class FakeDiscord:
+    """
+    Class holding the state of the stand-in of discord
+    """
+    # pylint: disable=R0902
+    guild: FakeGuild
+    channels: Dict[int, FakeChannel]
+    members: Dict[str, FakeMember]
+    sends: List[Tuple[float, int, Optional[str]]]
+    stalls: List[Tuple[int, float]]
+    latencies: List[float]
+    _rate_limit: Optional[Tuple[int, float]]
+    _buckets: Dict[int, Deque[float]]
+    _pending: Dict[str, float]
+
+    def __init__(self, channels: List[str],
+                 rate_limit: Optional[Tuple[int, float]] = RATE_LIMIT):
+        self.admin_role = FakeRole(1000, "sys_admin")
+        self.guild = FakeGuild(1, [self.admin_role])
+        self.channels = {}
+        for i, name in enumerate(channels):
+            channel = FakeChannel(self, 2000 + i, name)
+            self.channels[channel.id] = channel
+        self.members = {
+            "admin": FakeMember(3000, "admin", self.guild, [self.admin_role]),
+            "guest": FakeMember(3001, "guest", self.guild, [])}
+        self.sends = []
+        self.stalls = []
+        self.latencies = []
+        self._rate_limit = rate_limit
+        self._buckets = {}
+        self._pending = {}
+        self._log = logging.getLogger("discord.http")
+
+    def channel_id(self, name: str) -> int:
+        return next(channel.id for channel in self.channels.values()
+                    if channel.name == name)
+
+    def produced(self, message_id: str, time: float) -> None:
+        """
+        Records the time at which a message was sent by a producer
+
+        :param      message_id:  The identifier of the message
+        :type       message_id:  str
+        :param      time:        The time (perf_counter)
+        :type       time:        float
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._pending[message_id] = time
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of produced messages not sent on discord yet
+
+        :returns:   The number of messages
+        :rtype:     int
+        """
+        return len(self._pending)
+
+    async def rate_limit(self, channel_id: int) -> None:
+        """
+        Waits until a message can be sent on the channel, as the http client
+        of discord does when it receives a 429
+
+        :param      channel_id:  The channel identifier
+        :type       channel_id:  int
+
+        :returns:   None
+        :rtype:     None
+        """
+        if self._rate_limit is None:
+            return
+        limit, period = self._rate_limit
+        bucket = self._buckets.setdefault(channel_id, deque())
+        while True:
+            now = perf_counter()
+            while bucket and bucket[0] <= now - period:
+                bucket.popleft()
+            if len(bucket) < limit:
+                bucket.append(now)
+                return
+            retry_after = bucket[0] + period - now
+            self._log.warning(
+                "We are being rate limited. Retrying in %.2f seconds."
+                ' Handled under the bucket "%s"', retry_after,
+                f"{channel_id}:{self.guild.id}:/channels/{{channel_id}}")
+            self.stalls.append((channel_id, retry_after))
+            await asyncio.sleep(retry_after)
+
+    def record(self, channel_id: int, content: Optional[str],
+               kwargs: Dict[str, Any]) -> None:
+        now = perf_counter()
+        self.sends.append((now, channel_id, content))
+        if content is None and kwargs.get("file") is not None:
+            content = kwargs["file"].fp.getvalue().decode("utf-8")
+        match = MARKER.search(content or "")
+        if match is not None and match.group(1) in self._pending:
+            self.latencies.append(now - self._pending.pop(match.group(1)))
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-31 09:47:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-31 09:47:33
+
+"""Module running the bot against the stand-ins and measuring it"""
+
+import asyncio
+import math
+import os
+import socket
+import tempfile
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from src.bot import Bot
+from src.config import DEFAULT_CONFIG_PATH
+from src.maintainer import Maintainer
+
+from .commands import INTERACTION_DEADLINE, CommandScript
+from .fake_discord import FakeDiscord, FakeChannel
+from .producers import Swarm
+
+CHANNELS = ("log", "warn", "error", "report")
+
+
+class LoadBot(Bot):
+    """
+    Bot whose connection to discord is replaced by the stand-in
+    """
+
+    def __init__(self, discord: FakeDiscord, config_path: str):
+        self._discord = discord
+        super().__init__(config_path=config_path)
+
+    @property
+    def guilds(self):
+        return [self._discord.guild]
+
+    def get_channel(self, id: int):       # pylint: disable=W0622
+        return self._discord.channels.get(id)
+
+    async def fetch_channel(self, channel_id: int):
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            raise ValueError(f"Unknown channel {channel_id}")
+        return channel
+
+    def get_all_channels(self) -> Iterator[FakeChannel]:
+        yield from self._discord.channels.values()
+
+    async def wait_until_ready(self) -> None:
+        return
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _config(directory: str, discord: FakeDiscord,
+            ports: Dict[str, int], mirror: bool) -> str:
+    with open(os.path.join(DEFAULT_CONFIG_PATH, "discord-bot.yml"), "r",
+              encoding="utf-8") as file:
+        content = yaml.safe_load(file)
+    content["extensions"] = ["ssh"]
+    for name in CHANNELS:
+        content["channels"][name] = discord.channel_id(name)
+    content["permission"]["sys_admin"] = discord.admin_role.id
+    content["sockets"]["ssh"].update({
+        "ip": "127.0.0.1",
+        "port": ports["maintainer"],
+        "bind_port": ports["ingestion"],
+        "publish_port": ports["publish"] if mirror else "",
+        "heartbeat": 1})
+    content["health"]["endpoint"] = f"tcp://127.0.0.1:{ports['health']}"
+    content["metrics"]["port"] = ""
+    content["audit"]["path"] = os.path.join(directory, "audit.log")
+    content["debug"]["slow_callback"] = ""
+    path = os.path.join(directory, "discord-bot.yml")
+    with open(path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(content, file)
+    return path
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Gets a percentile, by the nearest rank method
+
+    :param      values:    The values
+    :type       values:    List[float]
+    :param      fraction:  The fraction, 0.99 for the 99th percentile
+    :type       fraction:  float
+
+    :returns:   The percentile, None without values
+    :rtype:     Optional[float]
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+async def run(producers: int = 4, messages: int = 25, rate: float = 0.0,
+              size: int = 200, commands: int = 20, concurrency: int = 2,
+              rate_limit: Optional[Tuple[int, float]] = (5, 5.0),
+              mirror: bool = True, commit_interval: float = 0.05,
+              drain_timeout: float = 120.0) -> Dict[str, Any]:
+    """
+    Runs the load test
+
+    :param      producers:        The number of ZMQ producers
+    :type       producers:        int
+    :param      messages:         The number of messages of each producer
+    :type       messages:         int
+    :param      rate:             The messages per second of each producer,
+                                  0 for as fast as possible
+    :type       rate:             float
+    :param      size:             The size of the messages
+    :type       size:             int
+    :param      commands:         The number of slash commands
+    :type       commands:         int
+    :param      concurrency:      The number of commands run at once
+    :type       concurrency:      int
+    :param      rate_limit:       The sends allowed per channel and period,
+                                  None for no rate limit
+    :type       rate_limit:       Optional[Tuple[int, float]]
+    :param      mirror:           Whether the bot mirrors the keys
+    :type       mirror:           bool
+    :param      commit_interval:  The commit interval of ssh-maintainer
+    :type       commit_interval:  float
+    :param      drain_timeout:    The delay given to the bot to send the
+                                  messages once all are produced, in seconds
+    :type       drain_timeout:    float
+
+    :returns:   The report
+    :rtype:     Dict[str, Any]
+    """
+    # pylint: disable=R0913,R0914
+    directory = tempfile.mkdtemp(prefix="discord-bot-loadtest-")
+    discord = FakeDiscord(list(CHANNELS), rate_limit)
+    ports = {name: _free_port()
+             for name in ("ingestion", "maintainer", "publish", "health")}
+    maintainer = Maintainer(None, ports["maintainer"], ports["publish"],
+                            heartbeat=1.0, commit_interval=commit_interval)
+    maintainer_task = asyncio.ensure_future(maintainer.run())
+    bot = LoadBot(discord, _config(directory, discord, ports, mirror))
+    try:
+        # Lets the sockets bind and the mirror subscribe
+        await asyncio.sleep(0.5)
+        swarm = Swarm(f"tcp://127.0.0.1:{ports['ingestion']}", producers,
+                      messages, discord.produced, rate, size)
+        script = CommandScript(bot, discord.members, commands, concurrency)
+        swarm.start_thread()
+        await asyncio.gather(swarm.join(), script.run())
+        deadline = perf_counter() + drain_timeout
+        while discord.pending > 0 and perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        return _report(discord, swarm, script, bot)
+    finally:
+        await bot.close()
+        maintainer_task.cancel()
+
+
+def _report(discord: FakeDiscord, swarm: Swarm, script: CommandScript,
+            bot: Bot) -> Dict[str, Any]:
+    delivered = len(discord.latencies)
+    last = max((time for time, _, _ in discord.sends), default=swarm.started)
+    duration = max(last - swarm.started, 1e-9)
+    report: Dict[str, Any] = {
+        "messages": {
+            "produced": swarm.acks + swarm.failures,
+            "acknowledged": swarm.acks,
+            "delivered": delivered,
+            "lost": discord.pending,
+            "sends": len(discord.sends),
+            "per_second": delivered / duration,
+            "p50": percentile(discord.latencies, 0.5),
+            "p99": percentile(discord.latencies, 0.99),
+            "max": max(discord.latencies, default=None)},
+        "rate_limits": {
+            "stalls": len(discord.stalls),
+            "stalled": sum(stall for _, stall in discord.stalls),
+            "counted_by_bot": sum(bot.metrics.rate_limits.get(str(channel))
+                                  for channel in discord.channels)},
+        "commands": {}}
+    for step in CommandScript.STEPS:
+        results = [result for result in script.results
+                   if result["step"] == step]
+        if not results:
+            continue
+        acknowledged = [result["acknowledged"] for result in results
+                        if result["acknowledged"] is not None]
+        completed = [result["completed"] for result in results]
+        report["commands"][step] = {
+            "count": len(results),
+            "unanswered": sum(1 for result in results
+                              if result["answers"] == 0),
+            "late": sum(1 for result in results
+                        if result["acknowledged"] is None
+                        or result["acknowledged"] > INTERACTION_DEADLINE),
+            "ack_p50": percentile(acknowledged, 0.5),
+            "ack_p99": percentile(acknowledged, 0.99),
+            "completed_p50": percentile(completed, 0.5),
+            "completed_p99": percentile(completed, 0.99)}
+    if swarm.errors:
+        report["errors"] = swarm.errors
+    return report
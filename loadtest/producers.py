@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-31 09:47:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-31 09:47:33
+
+"""Swarm of ZMQ producers sending messages to the socket of the bot"""
+
+import asyncio
+import random
+import threading
+from time import perf_counter
+from typing import Callable, List
+
+import zmq
+import zmq.asyncio
+
+from src.routing import LEVELS
+
+# Delay after which a producer gives up on the bot, in seconds
+ANSWER_TIMEOUT = 10.0
+
+
+class Swarm:
+    """
+    Class sending messages from several REQ sockets, in a thread of its own
+    so the producers do not compete with the bot for its event loop
+    """
+    # pylint: disable=R0902
+    _thread: threading.Thread
+    _produced: Callable[[str, float], None]
+    acks: int
+    failures: int
+    errors: List[str]
+
+    def __init__(self, endpoint: str, producers: int, messages: int,
+                 produced: Callable[[str, float], None], rate: float = 0.0,
+                 size: int = 200, seed: int = 0):
+        # pylint: disable=R0913
+        self._endpoint = endpoint
+        self._producers = producers
+        self._messages = messages
+        self._produced = produced
+        self._rate = rate
+        self._size = size
+        self._seed = seed
+        self._thread = threading.Thread(target=self._run, name="swarm",
+                                        daemon=True)
+        self.acks = 0
+        self.failures = 0
+        self.errors = []
+        self.started = 0.0
+        self.finished = 0.0
+
+    def start_thread(self) -> None:
+        self._thread.start()
+
+    async def join(self) -> None:
+        await asyncio.to_thread(self._thread.join)
+
+    def _run(self) -> None:
+        self.started = perf_counter()
+        asyncio.run(self._swarm())
+        self.finished = perf_counter()
+
+    async def _swarm(self) -> None:
+        context = zmq.asyncio.Context()         # pylint: disable=E0110
+        try:
+            await asyncio.gather(*(self._producer(context, i)
+                                   for i in range(self._producers)))
+        finally:
+            context.term()
+
+    async def _producer(self, context: zmq.asyncio.Context, index: int
+                        ) -> None:
+        rng = random.Random(self._seed + index)
+        socket = context.socket(zmq.REQ)
+        socket.connect(self._endpoint)
+        try:
+            for i in range(self._messages):
+                start = perf_counter()
+                message_id = f"{index}-{i}"
+                body = f"load {message_id} " + "x" * max(0, self._size - 20)
+                self._produced(message_id, start)
+                await socket.send_multipart(
+                    [rng.choice(LEVELS), f"producer{index}".encode("utf-8"),
+                     body.encode("utf-8")])
+                if not await socket.poll(ANSWER_TIMEOUT * 1000):
+                    self.errors.append(f"No answer to {message_id}")
+                    return
+                answer = await socket.recv_multipart()
+                if answer[0] == b"ACK":
+                    self.acks += 1
+                else:
+                    self.failures += 1
+                if self._rate > 0:
+                    await asyncio.sleep(max(0.0, start + 1 / self._rate
+                                            - perf_counter()))
+        except zmq.ZMQError as error:
+            self.errors.append(str(error))
+        finally:
+            socket.close(linger=0)
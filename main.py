@@ -4,20 +4,47 @@
 # @Author: Ultraxime
 # @Date:   2022-06-27 11:25:50
 # @Last Modified by:   Ultraxime
-# @Last Modified time: 2023-03-08 19:42:17
+# @Last Modified time: 2023-03-27 14:26:19
 
 """Main execution script"""
 
 import sys
-from src.bot import Bot
+from time import perf_counter
 
 if __name__ == "__main__":
     if len(sys.argv) == 2:
         if sys.argv[1] == "healthcheck":
+            from src.config import Config
+            from src.health import query
+            from src.health import process_endpoint
+            config = Config("/config")
+            state = query(process_endpoint(
+                config.get("health.endpoint"),
+                config.get("sharding.shard_ids")))
+            if state is None:
+                print("The bot did not answer.", file=sys.stderr)
+                sys.exit(1)
+            if state.get("status") != "ok":
+                print(state, file=sys.stderr)
+                sys.exit(1)
             sys.exit(0)
 
+        if sys.argv[1] == "coordinator":
+            import asyncio
+            from src.config import Config
+            from src.coordinator import Coordinator
+            asyncio.run(Coordinator(Config("/config")).run())
+
+        if sys.argv[1] == "maintainer":
+            import asyncio
+            from src.config import Config
+            from src.maintainer import Maintainer
+            asyncio.run(Maintainer.from_config(Config("/config")).run())
+
         if sys.argv[1] == "start":
-            bot = Bot()
+            start = perf_counter()
+            from src.bot import Bot
+            bot = Bot(perf_counter() - start)
             bot.run()
 
 sys.exit(1)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-22 11:24:06
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-22 11:24:06
+
+"""Module writing the audit log of the bot, in JSON lines"""
+
+import json
+import os
+import sys
+from queue import Empty, SimpleQueue
+from threading import Thread
+from time import monotonic, time
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+
+# Names of the values of each kind of event
+FIELDS: Dict[str, Tuple[str, ...]] = {
+    "command": ("user_id", "user", "command", "args", "latency", "outcome"),
+    "zmq": ("message",),
+    "ssh": ("request",),
+    "slow_callback": ("duration", "stack"),
+}
+BATCH_SIZE = 256
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+class AuditLog:
+    """
+    Class writing events as JSON lines from a background thread.
+
+    The callers only put a tuple in a queue, the formatting, the writing and
+    the rotation of the file are done by the writer thread, by batches.
+    """
+    _queue: SimpleQueue
+    _pending: Dict[int, Tuple[float, int, str, str, tuple]]
+    _path: Optional[str]
+    _max_size: int
+    _backups: int
+    _file: TextIO
+    _thread: Thread
+
+    def __init__(self, path: Optional[str] = None,
+                 max_size: int = 10 * 1024 * 1024, backups: int = 5):
+        self._queue = SimpleQueue()
+        self._pending = {}
+        self._path = path if path else None
+        self._max_size = max_size
+        self._backups = backups
+        self._thread = Thread(target=self._run, name="audit-log",
+                              daemon=True)
+        self._thread.start()
+
+    def event(self, kind: str, *values) -> None:
+        """
+        Records an event
+
+        :param      kind:    The kind of event, a key of FIELDS
+        :type       kind:    str
+        :param      values:  The values of the fields of this kind
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._queue.put((time(), kind, values))
+
+    def command(self, key: int, user_id: int, user: str,
+                command: str, args: tuple) -> None:
+        """
+        Records the beginning of a command, it is logged once it is finished
+
+        :param      key:      The key of the command (its interaction id)
+        :type       key:      int
+        :param      user_id:  The user identifier
+        :type       user_id:  int
+        :param      user:     The user name
+        :type       user:     str
+        :param      command:  The command
+        :type       command:  str
+        :param      args:     The arguments
+        :type       args:     tuple
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._pending[key] = (monotonic(), user_id, user, command, args)
+
+    def outcome(self, key: int, outcome: str, user_id: int = 0,
+                user: str = "", command: str = "") -> Optional[float]:
+        """
+        Records the outcome of a command
+
+        :param      key:      The key given to command
+        :type       key:      int
+        :param      outcome:  The outcome
+        :type       outcome:  str
+        :param      user_id:  The user identifier, if the command was
+                              never recorded
+        :type       user_id:  int
+        :param      user:     The user name, idem
+        :type       user:     str
+        :param      command:  The command, idem
+        :type       command:  str
+
+        :returns:   The latency of the command, None if it was never recorded
+        :rtype:     Optional[float]
+        """
+        try:
+            start, user_id, user, command, args = self._pending.pop(key)
+            latency = monotonic() - start
+        except KeyError:
+            args = ()
+            latency = None
+        self.event("command", user_id, user, command, args, latency, outcome)
+        return latency
+
+    def close(self) -> None:
+        """
+        Writes the remaining events and stops the writer
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open(self) -> TextIO:
+        if self._path is None:
+            return sys.stdout
+        directory = os.path.dirname(self._path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        return open(self._path, "a", encoding="utf-8")
+
+    def _rotate(self) -> None:
+        assert self._path is not None
+        self._file.close()
+        for i in range(self._backups - 1, 0, -1):
+            if os.path.exists(f"{self._path}.{i}"):
+                os.replace(f"{self._path}.{i}", f"{self._path}.{i+1}")
+        if self._backups > 0:
+            os.replace(self._path, f"{self._path}.1")
+        else:
+            os.remove(self._path)
+        self._file = self._open()
+
+    def _format(self, item: tuple) -> str:
+        timestamp, kind, values = item
+        record: Dict[str, Any] = {"time": timestamp, "event": kind}
+        record.update(zip(FIELDS.get(kind, ()), values))
+        return json.dumps(record, default=_default) + "\n"
+
+    def _run(self) -> None:
+        self._file = self._open()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+            if None in batch:
+                running = False
+                batch = batch[:batch.index(None)]
+
+            try:
+                self._file.write("".join(self._format(item)
+                                         for item in batch))
+                self._file.flush()
+                if (self._path is not None
+                        and self._file.tell() > self._max_size):
+                    self._rotate()
+            except (OSError, ValueError) as error:
+                print(f"Unable to write the audit log: {error}",
+                      file=sys.stderr)
+        if self._file is not sys.stdout:
+            self._file.close()
@@ -7,38 +7,197 @@
 """Module creating a discord bot"""
 
 from collections.abc import Awaitable
-from typing import Union
+import json
+from typing import Dict, Optional, Tuple, Union
 import sys
-from asyncio import Future
+from asyncio import Future, Queue
+from time import monotonic, perf_counter
 
 import zmq
 import zmq.asyncio
 
-from discord import Guild, Member, User, TextChannel, ApplicationContext
+from discord import (Guild, Member, User, Role, TextChannel, Thread,
+                     ApplicationContext, DiscordException)
 from discord.ext import commands, tasks
 from discord.ext.commands import CommandError, Context
 
 
 from .config import Config
-from .commands import Ssh, Funny
+from .commands.message import Message
+from .routing import FALL_BACK, Router, parse_destination, parse_message
+from .permissions import PermissionResolver, MissingPermission
+from .audit import AuditLog
+from .metrics import Metrics
+from .health import HealthProbe, process_endpoint
+from .profiler import SlowCallbackDetector
+from .ssh_client import MaintainerUnavailable
 
 
-class Bot(commands.Bot):
+class Bot(commands.AutoShardedBot):
     """Class representing a discord bot"""
     __config: Config
-
-    def __init__(self):
-        self.__config = Config("/config")
+    __router: Router
+    __permissions: PermissionResolver
+    __audit: AuditLog
+    __metrics: Metrics
+    __queue: Queue[Tuple[str, str, Optional[str], Optional[int]]]
+    __health: HealthProbe
+    __last_send: Optional[float]
+    __slow_callbacks: Optional[SlowCallbackDetector]
+    __slow_report_interval: float
+    __last_slow_report: Optional[float]
+    __unreported_slow: int
+    __startup: Dict[str, float]
+    __connect_start: Optional[float]
+
+    def __init__(self, import_time: Optional[float] = None,
+                 config_path: str = "/config"):
+        self.__startup = {} if import_time is None \
+            else {"import": import_time}
+        self.__connect_start = None
+        start = perf_counter()
+        self.__config = Config(config_path)
+        self.__audit = AuditLog(self.__config.get("audit.path"),
+                                int(self.__config.get("audit.max_size")),
+                                int(self.__config.get("audit.backups")))
+        self.__router = Router(self.__config.get("routing"))
+        self.__permissions = PermissionResolver(self.get_param)
+        self.__queue = Queue(int(self.__config.get("messages.queue_size")))
+        self.__metrics = Metrics(self.__queue.qsize)
+        shard_count = self.__config.get("sharding.shard_count")
+        shard_ids = self.__config.get("sharding.shard_ids")
+        if shard_ids and shard_count in (None, "", "auto"):
+            raise ValueError("sharding.shard_ids needs a number of shards "
+                             + "in sharding.shard_count, not auto.")
+        self.__health = HealthProbe(
+            self, process_endpoint(self.__config.get("health.endpoint"),
+                                   shard_ids),
+            max_lag=float(self.__config.get("health.max_lag")),
+            max_send_age=float(self.__config.get("health.max_send_age")))
+        self.__last_send = None
+        threshold = self.__config.get("debug.slow_callback")
+        self.__slow_callbacks = (
+            None if threshold is None or threshold == ""
+            else SlowCallbackDetector(float(threshold),
+                                      self._report_slow_callback))
+        self.__slow_report_interval = float(
+            self.__config.get("debug.slow_callback_interval"))
+        self.__last_slow_report = None
+        self.__unreported_slow = 0
         super().__init__(description=self.__config.get("description"),
-                         help_command=commands.MinimalHelpCommand())
-        self.add_application_command(Ssh(self))
-        self.add_cog(Funny(self))
-
-        self.zmq_messages_handler.start()           # pylint: disable=E1101
+                         help_command=commands.MinimalHelpCommand(),
+                         shard_count=(None if shard_count in (None, "", "auto")
+                                      else int(shard_count)),
+                         shard_ids=shard_ids if shard_ids else None)
+        self.__startup["config"] = perf_counter() - start
+
+        start = perf_counter()
+        for extension in self.__config.get("extensions"):
+            self.reload(extension)
+        self.__startup["extensions"] = perf_counter() - start
+
+        if self.coordinated:
+            self.coordinator_client.start()         # pylint: disable=E1101
+        else:
+            self.zmq_messages_handler.start()       # pylint: disable=E1101
+        self.zmq_messages_sender.start()            # pylint: disable=E1101
+        self.metrics_server.start()                 # pylint: disable=E1101
+        self.health_probe.start()                   # pylint: disable=E1101
 
     def run(self, *args, **kwargs):
+        self.__connect_start = perf_counter()
         super().run(self.__config.get("bot_token"))#, args, kwargs)
 
+    def reload(self, extension: str) -> None:
+        """
+        Loads an extension of src.commands, or reloads it if it is loaded
+
+        :param      extension:  The name of the extension (ssh, funny, ...)
+        :type       extension:  str
+
+        :returns:   None
+        :rtype:     None
+
+        :raises     ExtensionError:  When the extension can not be loaded
+        """
+        name = f"{__package__}.commands.{extension}"
+        if name in self.extensions:
+            self.reload_extension(name)
+        else:
+            self.load_extension(name)
+
+    @property
+    def startup(self) -> Dict[str, float]:
+        """
+        The duration of each step of the startup, in seconds
+
+        :returns:   The durations of the import, the config, the extensions
+                    and the connection
+        :rtype:     Dict[str, float]
+        """
+        return self.__startup
+
+    @property
+    def audit(self) -> AuditLog:
+        """
+        The audit log of the bot
+
+        :returns:   The audit log
+        :rtype:     AuditLog
+        """
+        return self.__audit
+
+    @property
+    def metrics(self) -> Metrics:
+        """
+        The metrics of the bot
+
+        :returns:   The metrics
+        :rtype:     Metrics
+        """
+        return self.__metrics
+
+    @property
+    def last_send(self) -> Optional[float]:
+        """
+        The time (monotonic) of the last message successfully sent on discord
+
+        :returns:   The time, None if nothing was sent yet
+        :rtype:     Optional[float]
+        """
+        return self.__last_send
+
+    @property
+    def ingestion_running(self) -> bool:
+        """
+        Whether the loops receiving and sending the ZMQ messages are running
+
+        :returns:   True if they are running, False otherwise
+        :rtype:     bool
+        """
+        receiver = (self.coordinator_client if self.coordinated
+                    else self.zmq_messages_handler)
+        return (receiver.is_running()                       # pylint: disable=E1101
+                and self.zmq_messages_sender.is_running())  # pylint: disable=E1101
+
+    @property
+    def coordinated(self) -> bool:
+        """
+        Whether the messages are received from the coordinator of a sharded
+        bot spread across several processes, instead of the socket
+
+        :returns:   True if there is a coordinator, False otherwise
+        :rtype:     bool
+        """
+        coordinator = self.__config.get("sharding.coordinator.ip")
+        return coordinator is not None and coordinator != ""
+
+    async def close(self) -> None:
+        if self.__slow_callbacks is not None:
+            self.__slow_callbacks.stop()
+        await super().close()
+        self.__audit.close()
+
     def get_param(self, param: str):
         """
         Gets the value of a parameter from the bot config.
@@ -63,15 +222,15 @@ class Bot(commands.Bot):
         :returns:   None
         :rtype:     None
         """
-        return self.__config.set(param, value)
+        self.__config.set(param, value)
+        if param.split('.')[0] == "routing":
+            self.__router = Router(self.__config.get("routing"))
+        elif param.split('.')[0] == "permission":
+            self.__permissions.invalidate()
 
     async def _get_channel(self, channel_name: str = 'log') -> TextChannel:
         channel_id = self.__config.get(f"channels.{channel_name}")
-
-        fall_back = {"report": "log",
-                     "error": "warn",
-                     "warn": "log"}
-
+        fall_back = FALL_BACK
 
         if channel_id is None or channel_id == "":
             if channel_name == 'log':
@@ -103,6 +262,16 @@ class Bot(commands.Bot):
         return channel
 
 
+    async def _send(self, channel: Union[TextChannel, Thread],
+                    content: str) -> None:
+        start = perf_counter()
+        await Message(content,
+                      self.get_param("messages.attachment_size")
+                      ).send_to(channel)
+        self.__metrics.send_latency.observe(perf_counter() - start,
+                                            str(channel.id))
+        self.__last_send = monotonic()
+
     async def log(self, msg: str, header: str = "[LOG]") -> None:
         """
         Send a log on discord, through the bot
@@ -120,8 +289,7 @@ class Bot(commands.Bot):
                      or this channel does not exist
         """
         channel = await self._get_channel("log")
-
-        await channel.send(header + " " + msg)
+        await self._send(channel, header + " " + msg)
 
     async def warn(self, msg: str, header: str = "[WARN]") -> None:
         """
@@ -136,7 +304,7 @@ class Bot(commands.Bot):
         :rtype:     None
         """
         channel = await self._get_channel("warn")
-        await channel.send(header + " " + msg)
+        await self._send(channel, header + " " + msg)
 
     async def error(self, msg: str, header: str = "[ERROR]") -> None:
         """
@@ -151,7 +319,7 @@ class Bot(commands.Bot):
         :rtype:     None
         """
         channel = await self._get_channel("error")
-        await channel.send(header + " " + msg)
+        await self._send(channel, header + " " + msg)
 
     async def report(self, msg: str, header: str = "[REPORT]") -> None:
         """
@@ -166,7 +334,75 @@ class Bot(commands.Bot):
         :rtype:     None
         """
         channel = await self._get_channel("report")
-        await channel.send(header + " " + msg)
+        await self._send(channel, header + " " + msg)
+
+    async def _get_destination(self, destination: str
+                               ) -> Union[TextChannel, Thread]:
+        target = parse_destination(destination)
+        if isinstance(target, str):
+            return await self._get_channel(target)
+
+        channel = self.get_channel(target)
+        if channel is None:
+            channel = await self.fetch_channel(target)
+        if not isinstance(channel, (TextChannel, Thread)):
+            raise ValueError(f"{destination} is not a text channel "
+                             + "or a thread.")
+        return channel
+
+    async def route(self, level: str, msg: str,
+                    source: Union[str, None] = None) -> None:
+        """
+        Send a message on discord to the destinations given by the routing
+        rules, or to the channel of its level if no rule matches
+
+        :param      level:   The level (LOG, WARN, ERROR or REPORT)
+        :type       level:   str
+        :param      msg:     The message
+        :type       msg:     str
+        :param      source:  The source of the message
+        :type       source:  Union[str, None]
+
+        :returns:   None
+        :rtype:     None
+        """
+        level = level.upper()
+        destinations = self.__router.route(level, msg, source)
+        if len(destinations) == 0:
+            await getattr(self, level.lower())(msg)
+            return
+
+        header = f"[{level}]" if source is None else f"[{level}] [{source}]"
+        for destination in destinations:
+            try:
+                channel = await self._get_destination(destination)
+            except (ValueError, DiscordException) as error:
+                print(f"Unable to route to {destination}: {error}",
+                      file=sys.stderr)
+                continue
+            await self._send(channel, header + " " + msg)
+
+    async def deliver(self, level: str, msg: str, source: Union[str, None],
+                      channel_id: int) -> None:
+        """
+        Send a message routed by the coordinator on one of the channels owned
+        by this process
+
+        :param      level:       The level (LOG, WARN, ERROR or REPORT)
+        :type       level:       str
+        :param      msg:         The message
+        :type       msg:         str
+        :param      source:      The source of the message
+        :type       source:      Union[str, None]
+        :param      channel_id:  The channel identifier
+        :type       channel_id:  int
+
+        :returns:   None
+        :rtype:     None
+        """
+        header = f"[{level}]" if source is None else f"[{level}] [{source}]"
+        channel = await self._get_destination(str(channel_id))
+        await self._send(channel, header + " " + msg)
 
     async def on_ready(self) -> None:
         """
@@ -182,13 +418,78 @@ class Bot(commands.Bot):
         print(self.user.name)
         print(self.user.id)
         print('------')
-        await self.log(self.user.name + " is now online.")
+        if self.__connect_start is not None and "connect" not in self.__startup:
+            self.__startup["connect"] = perf_counter() - self.__connect_start
+        report = ", ".join(f"{step} {duration:.3f}s"
+                           for step, duration in self.__startup.items())
+        print("Startup: " + report)
+        await self.log(self.user.name + " is now online. (" + report + ")")
+        if self.__slow_callbacks is not None:
+            self.__slow_callbacks.start()
+
+    async def _report_slow_callback(self, duration: float, stack: str) -> None:
+        self.__audit.event("slow_callback", duration, stack)
+        # At most one report per interval on the warn channel, so a busy loop
+        # does not take the rate limit of the other alerts
+        now = monotonic()
+        if (self.__last_slow_report is not None
+                and now - self.__last_slow_report
+                < self.__slow_report_interval):
+            self.__unreported_slow += 1
+            return
+        self.__last_slow_report = now
+        unreported = self.__unreported_slow
+        self.__unreported_slow = 0
+        await self.warn(f"The event loop was blocked for {duration:.3f}s by:\n"
+                        + f"```py\n{stack}```"
+                        + (f"\n{unreported} other stalls were not reported."
+                           if unreported else ""))
 
     async def on_command_error(self, context: Context, exception: CommandError):
         await context.reply("The command failed.")
         print("error")
         return await super().on_command_error(context, exception)
 
+    async def on_application_command_error(self,
+                                           context: ApplicationContext,
+                                           exception: DiscordException):
+        original = getattr(exception, "original", None)
+        # The commands deferring their response check the permission
+        # themselves, the error is then wrapped
+        denied = (isinstance(exception, MissingPermission)
+                  or isinstance(original, MissingPermission))
+        self.__audit.outcome(context.interaction.id,
+                             "denied" if denied
+                             else "unavailable" if isinstance(
+                                 original, MaintainerUnavailable)
+                             else "error",
+                             context.author.id, context.author.name,
+                             "/" + context.command.qualified_name)
+        if denied:
+            await context.respond(
+                "You don,t have the right to perform this command")
+            return
+        if isinstance(original, MaintainerUnavailable):
+            await context.respond(str(original))
+            return
+        return await super().on_application_command_error(context, exception)
+
+    async def on_application_command_completion(self,
+                                                context: ApplicationContext):
+        latency = self.__audit.outcome(context.interaction.id, "ok")
+        if latency is not None:
+            self.__metrics.command_latency.observe(
+                latency, "/" + context.command.qualified_name)
+
+    async def on_guild_role_create(self, role: Role) -> None:
+        self.__permissions.invalidate_guild(role.guild)
+
+    async def on_guild_role_update(self, _: Role, after: Role) -> None:
+        self.__permissions.invalidate_guild(after.guild)
+
+    async def on_guild_role_delete(self, role: Role) -> None:
+        self.__permissions.invalidate_guild(role.guild)
+
     @tasks.loop(count=1)
     async def zmq_messages_handler(self) -> None:
         """
@@ -202,42 +503,122 @@ class Bot(commands.Bot):
         await self.wait_until_ready()
         context = zmq.asyncio.Context()         # pylint: disable=E0110
         socket = context.socket(zmq.REP)
-        socket.bind("tcp://*:" + str(self.__config.get("sockets.ssh.port")))
+        port = self.__config.get("sockets.ssh.bind_port")
+        if port is None or port == "":
+            port = self.__config.get("sockets.ssh.port")
+        socket.bind("tcp://*:" + str(port))
         while not self.is_closed():
             msg = socket.recv_multipart(copy=True)
             assert isinstance(msg, Awaitable)
             await msg
             assert isinstance(msg, Future)
             msg = msg.result()
-            print("Recv: ")
-            print(msg)
-            if len(msg) != 2:
+            self.__audit.event("zmq", msg)
+            if len(msg) > 0 and msg[0] == b"STATS":
+                await socket.send_multipart(
+                    [b"ACK", self.__metrics.render().encode("utf-8")])
+                continue
+            parsed = parse_message(msg)
+            if parsed is None:
                 await socket.send_multipart([b"FAIL", b"Unvalid message"])
                 print("[INFO] Received an invalid message",
                       file=sys.stderr)
                 print(msg,
                       file=sys.stderr)
             else:
-                content = msg[1]
-                assert isinstance(content, bytes)
-                if msg[0] == b"LOG":
-                    await socket.send_multipart([b"ACK"])
-                    await self.log(content.decode("utf-8"))
-                elif msg[0] == b"WARN":
-                    await socket.send_multipart([b"ACK"])
-                    await self.warn(content.decode("utf-8"))
-                elif msg[0] == b"ERROR":
-                    await socket.send_multipart([b"ACK"])
-                    await self.error(content.decode("utf-8"))
-                elif msg[0] == b"REPORT":
-                    await socket.send_multipart([b"ACK"])
-                    await self.report(content.decode("utf-8"))
+                await socket.send_multipart([b"ACK"])
+                self.__metrics.zmq_messages.inc(parsed[0])
+                await self.__queue.put(parsed + (None,))
+
+    @tasks.loop(count=1)
+    async def coordinator_client(self) -> None:
+        """
+        Receives the messages routed to this process by the coordinator of a
+        sharded bot, and registers the channels owned by this process
+
+        :returns:   None
+        :rtype:     None
+        """
+        await self.wait_until_ready()
+        context = zmq.asyncio.Context()         # pylint: disable=E0110
+        socket = context.socket(zmq.DEALER)
+        socket.connect("tcp://" + self.__config.get("sharding.coordinator.ip")
+                       + ":"
+                       + str(self.__config.get("sharding.coordinator.port")))
+        poller = zmq.asyncio.Poller()
+        poller.register(socket, zmq.POLLIN)
+        interval = float(self.__config.get("sharding.register_interval"))
+        next_register = 0.0
+        while not self.is_closed():
+            if monotonic() >= next_register:
+                channels = [channel.id for channel in self.get_all_channels()
+                            if isinstance(channel, TextChannel)]
+                channels += [thread.id for guild in self.guilds
+                             for thread in guild.threads]
+                await socket.send_multipart(
+                    [b"CHANNELS", json.dumps(channels).encode("utf-8")])
+                next_register = monotonic() + interval
+            if not await poller.poll(interval * 1000):
+                continue
+            msg = await socket.recv_multipart()
+            self.__audit.event("zmq", msg)
+            if len(msg) != 5 or msg[0] != b"SEND":
+                print("[INFO] Received an invalid message from the coordinator",
+                      file=sys.stderr)
+                continue
+            level = msg[1].decode("utf-8")
+            self.__metrics.zmq_messages.inc(level)
+            await self.__queue.put((level, msg[3].decode("utf-8"),
+                                    msg[2].decode("utf-8") or None,
+                                    int(msg[4])))
+
+    @tasks.loop(count=1)
+    async def zmq_messages_sender(self) -> None:
+        """
+        Sends on discord the messages received by the ZMQ handler, in order
+
+        :returns:   None
+        :rtype:     None
+        """
+        await self.wait_until_ready()
+        while not self.is_closed():
+            level, content, source, channel_id = await self.__queue.get()
+            try:
+                if channel_id is None:
+                    await self.route(level, content, source)
                 else:
-                    await socket.send_multipart([b"FAIL", b"Unvalid message"])
-                    print("[INFO] Received an invalid message",
-                          file=sys.stderr)
-                    print(msg,
-                          file=sys.stderr)
+                    await self.deliver(level, content, source, channel_id)
+            except (ValueError, DiscordException) as error:
+                print(f"Unable to send a {level} message: {error}",
+                      file=sys.stderr)
+            finally:
+                self.__queue.task_done()
+
+    @tasks.loop(count=1)
+    async def metrics_server(self) -> None:
+        """
+        Serves the metrics in the Prometheus format over HTTP
+
+        :returns:   None
+        :rtype:     None
+        """
+        port = self.__config.get("metrics.port")
+        if port is None or port == "":
+            return
+        server = await self.__metrics.serve(self.__config.get("metrics.host"),
+                                            int(port))
+        async with server:
+            await server.serve_forever()
+
+    @tasks.loop(count=1)
+    async def health_probe(self) -> None:
+        """
+        Answers the healthcheck
+
+        :returns:   None
+        :rtype:     None
+        """
+        await self.__health.serve()
 
     async def has_permission(self,
                              context: ApplicationContext,
@@ -262,15 +643,38 @@ class Bot(commands.Bot):
             return False
         assert isinstance(user, Member)
 
-        role_id = self.get_param("permission." + permission)
-        if role_id is None or role_id == "":
-            return True
         guild = context.guild
         assert isinstance(guild, Guild)
-        role = guild.get_role(int(role_id))
+        roles = self.__permissions.roles(guild, permission)
+        if roles is None:
+            return True
 
-        if role is None:
+        if len(roles) == 0:
             await context.send("Error: The permission id does not exist.")
             return True
 
-        return role in user.roles
+        return self.__permissions.allowed(user, roles)
+
+    def may(self, guild: Optional[Guild], user: Union[Member, User],
+            permission: str) -> bool:
+        """
+        Determines silently if the user has the permission, for the
+        interactions which cannot report an error, like the autocompletion.
+        A permission none of whose roles exists is denied.
+
+        :param      guild:       The guild
+        :type       guild:       Optional[Guild]
+        :param      user:        The user
+        :type       user:        Union[Member, User]
+        :param      permission:  The permission
+        :type       permission:  str
+
+        :returns:   True if permission, False otherwise.
+        :rtype:     bool
+        """
+        if guild is None or not isinstance(user, Member):
+            return False
+        roles = self.__permissions.roles(guild, permission)
+        if roles is None:
+            return True
+        return self.__permissions.allowed(user, roles)
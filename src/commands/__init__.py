@@ -2,11 +2,25 @@
 # @Author: Ultraxime
 # @Date:   2023-03-09 13:15:15
 # @Last Modified by:   Ultraxime
-# @Last Modified time: 2023-03-09 13:19:36
+# @Last Modified time: 2023-03-26 09:48:31
 
+"""
+Commands of the bot. Each module is a discord extension loaded by the bot,
+they are only imported when first needed.
+"""
+
+from importlib import import_module
 
 __all__ = ["Ssh",
-           "Funny"]
+           "Funny",
+           "Debug"]
+
+_MODULES = {"Ssh": ".ssh",
+            "Funny": ".funny",
+            "Debug": ".debug"}
+
 
-from .ssh import Ssh
-from .funny import Funny
+def __getattr__(name: str):
+    if name in _MODULES:
+        return getattr(import_module(_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-25 11:32:10
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-25 11:32:10
+
+import asyncio
+import threading
+from io import BytesIO
+
+from discord.ext.commands import slash_command
+from discord.commands import Option
+from discord import ApplicationContext, File, ExtensionError
+
+from .default import DefaultCommandGroup
+from ..permissions import require
+from ..profiler import sample
+
+
+MAX_PROFILE_DURATION = 60
+
+
+class Debug(DefaultCommandGroup):
+
+    def __init__(self, bot):
+        super().__init__(bot, "debug", description="Debugging commands")
+
+    @slash_command(name="profile",
+                   description="Samples the event loop of the bot")
+    @require("sys_admin")
+    async def on_profile(self, ctx: ApplicationContext,
+                         seconds: Option(
+                             int,
+                             description="Duration of the sampling",
+                             min_value=1,
+                             max_value=MAX_PROFILE_DURATION,
+                             default=10)) -> None:
+        """
+        Called on debug profile command. Samples the stack of the event loop
+        and uploads it in the collapsed format, ready for a flamegraph
+
+        :param      ctx:      The context
+        :type       ctx:      ApplicationContext
+        :param      seconds:  The duration of the sampling
+        :type       seconds:  int
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._command_used(ctx, "/debug profile", seconds)
+
+        await ctx.defer()
+        stacks = await asyncio.to_thread(sample, threading.get_ident(),
+                                         seconds)
+        if stacks == "":
+            await ctx.followup.send("No sample was taken.")
+            return
+        await ctx.followup.send(
+            f"Profile of {seconds}s of the event loop.",
+            file=File(BytesIO(stacks.encode("utf-8")),
+                      filename="profile.folded"))
+
+    @slash_command(name="reload",
+                   description="Loads or reloads an extension of the bot")
+    @require("sys_admin")
+    async def on_reload(self, ctx: ApplicationContext,
+                        extension: Option(
+                            str,
+                            description="Name of the extension")) -> None:
+        """
+        Called on debug reload command. Reloads the extension, or loads it if
+        it was not loaded yet, and syncs the commands with discord
+
+        :param      ctx:        The context
+        :type       ctx:        ApplicationContext
+        :param      extension:  The extension
+        :type       extension:  str
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._command_used(ctx, "/debug reload", extension)
+
+        await ctx.defer()
+        try:
+            self._bot.reload(extension)
+        except ExtensionError as error:
+            await ctx.followup.send(f"Unable to reload {extension}: {error}")
+            return
+        await self._bot.sync_commands()
+        await ctx.followup.send(extension + " was reloaded with success.")
+
+
+def setup(bot):
+    bot.add_application_command(Debug(bot))
+
+
+def teardown(bot):
+    for command in list(bot.pending_application_commands):
+        if isinstance(command, Debug):
+            bot.remove_application_command(command)
@@ -6,7 +6,7 @@
 
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from discord import SlashCommandGroup
+from discord import SlashCommand, SlashCommandGroup
 
 
 from discord.ext.commands import Cog
@@ -23,10 +23,8 @@ class DefaultCog(Cog):
         self._bot = bot
 
     def _command_used(self, ctx: ApplicationContext, cmd: str, *args):
-        arg_str = ""
-        for arg in args:
-            arg_str += " " + str(arg)
-        print(ctx.author.name + " issued " + cmd + arg_str)
+        self._bot.audit.command(ctx.interaction.id, ctx.author.id,
+                                ctx.author.name, cmd, args)
 
 
 class DefaultCommandGroup(SlashCommandGroup):
@@ -35,9 +33,12 @@ class DefaultCommandGroup(SlashCommandGroup):
     def __init__(self, bot, name, **kwargs):
         self._bot = bot
         super().__init__(name, **kwargs)
+        # The options of the subcommands are parsed before they are attached
+        # to the group, with ctx taken for an option instead of self
+        for command in self.subcommands:
+            if isinstance(command, SlashCommand):
+                command._validate_parameters()  # pylint: disable=W0212
 
     def _command_used(self, ctx: ApplicationContext, cmd: str, *args):
-        arg_str = ""
-        for arg in args:
-            arg_str += " " + str(arg)
-        print(ctx.author.name + " issued " + cmd + arg_str)
+        self._bot.audit.command(ctx.interaction.id, ctx.author.id,
+                                ctx.author.name, cmd, args)
@@ -29,3 +29,7 @@ class Funny(DefaultCog):
         """
         self._command_used(ctx, "/ping")
         await ctx.respond("pong")
+
+
+def setup(bot):
+    bot.add_cog(Funny(bot))
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-21 09:37:52
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-21 09:37:52
+
+from typing import Optional
+
+from discord import ButtonStyle, Embed, Interaction
+from discord.ui import View, Modal, InputText, button
+
+from ..ssh_keys import SshKeyIndex
+
+
+PAGE_SIZE = 15
+# Longest line of a page, the description of an embed is limited to 4096
+MAX_LINE_LENGTH = 200
+
+
+def _page_count(count: int) -> int:
+    return max(1, -(-count // PAGE_SIZE))
+
+
+class JumpModal(Modal):
+
+    def __init__(self, view: "KeyListView"):
+        self._view = view
+        super().__init__(title="Go to page")
+        self.add_item(InputText(label=f"Page (1-{view.page_count})",
+                                placeholder=str(view.page + 1)))
+
+    async def callback(self, interaction: Interaction):
+        value = self.children[0].value
+        try:
+            page = int(value or "") - 1
+        except ValueError:
+            await interaction.response.send_message(
+                f"{value} is not a valid page.", ephemeral=True)
+            return
+        await self._view.show(interaction, page)
+
+
+class KeyListView(View):
+    """
+    Paginated listing of the keys, only the visible page is rendered.
+
+    The index may be the live one of the mirror, so the range of the prefix
+    is looked up again on each rendering.
+    """
+    _index: SshKeyIndex
+
+    def __init__(self, index: SshKeyIndex, prefix: str = "",
+                 author_id: Optional[int] = None,
+                 timeout: float | None = 300):
+        self._index = index
+        self._prefix = prefix
+        self._author_id = author_id
+        self.page = 0
+        super().__init__(timeout=timeout, disable_on_timeout=True)
+        self._update_buttons()
+
+    def __len__(self) -> int:
+        start, stop = self._index.prefix_range(self._prefix)
+        return stop - start
+
+    @property
+    def page_count(self) -> int:
+        return _page_count(len(self))
+
+    def render(self) -> Embed:
+        """
+        Renders the current page
+
+        :returns:   The embed of the page
+        :rtype:     Embed
+        """
+        title = "SSH keys"
+        if self._prefix != "":
+            title += " starting with " + self._prefix
+        first, stop = self._index.prefix_range(self._prefix)
+        count = stop - first
+        if count == 0:
+            return Embed(title=title, description="There are no keys.")
+
+        # Keys may have been removed since the page was chosen
+        self.page = min(self.page, _page_count(count) - 1)
+        start = first + self.page * PAGE_SIZE
+        lines = []
+        for path in self._index.paths(start, min(start + PAGE_SIZE, stop)):
+            key = self._index.get(path)
+            line = f"`{path}` {key.short() if key is not None else ''}"
+            if len(line) > MAX_LINE_LENGTH:
+                line = line[:MAX_LINE_LENGTH-1] + "…"
+            lines.append(line)
+        embed = Embed(title=title, description="\n".join(lines))
+        embed.set_footer(
+            text=f"Page {self.page + 1}/{_page_count(count)}"
+            + f" - {count} keys")
+        return embed
+
+    def _update_buttons(self) -> None:
+        self.previous_callback.disabled = self.page == 0
+        self.next_callback.disabled = self.page >= self.page_count - 1
+        self.jump_callback.disabled = self.page_count == 1
+
+    async def show(self, interaction: Interaction, page: int) -> None:
+        """
+        Shows a page, by editing the message of the listing
+
+        :param      interaction:  The interaction
+        :type       interaction:  Interaction
+        :param      page:         The page, clamped to the existing ones
+        :type       page:         int
+
+        :returns:   None
+        :rtype:     None
+        """
+        self.page = min(max(page, 0), self.page_count - 1)
+        embed = self.render()
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        if (self._author_id is not None and interaction.user is not None
+                and interaction.user.id != self._author_id):
+            await interaction.response.send_message(
+                "Only the author of the command can use this listing.",
+                ephemeral=True)
+            return False
+        return True
+
+    @button(label="Previous", style=ButtonStyle.secondary)
+    async def previous_callback(self, _, interaction):
+        await self.show(interaction, self.page - 1)
+
+    @button(label="Next", style=ButtonStyle.secondary)
+    async def next_callback(self, _, interaction):
+        await self.show(interaction, self.page + 1)
+
+    @button(label="Go to", style=ButtonStyle.primary)
+    async def jump_callback(self, _, interaction):
+        await interaction.response.send_modal(JumpModal(self))
@@ -2,37 +2,137 @@
 # @Author: Ultraxime
 # @Date:   2023-03-16 17:48:12
 # @Last Modified by:   Ultraxime
-# @Last Modified time: 2023-03-16 18:34:43
+# @Last Modified time: 2023-03-20 14:02:18
+
+from io import BytesIO
+from typing import Iterator, List, Optional
+
+from discord import File
+from discord.abc import Messageable
+
+
+MAX_LENGTH = 2000
+FENCE = "```"
+# Longest fence opening ("```python") carried over to the next chunk
+MAX_FENCE_LENGTH = 16
+
+
+def split_message(content: str, limit: int = MAX_LENGTH) -> Iterator[str]:
+    """
+    Splits a content in chunks that Discord accepts.
+
+    Lines are kept whole when possible, lines longer than a chunk are hard
+    split, and code blocks opened in a chunk are closed at its end and
+    reopened at the beginning of the next one.
+
+    :param      content:  The content
+    :type       content:  str
+    :param      limit:    The maximal length of a chunk
+    :type       limit:    int
+
+    :returns:   The chunks, lazily
+    :rtype:     Iterator[str]
+    """
+    # Room always kept at the end of a chunk to close a code block
+    reserve = len(FENCE) + 1
+    fence: Optional[str] = None
+    chunk: List[str] = []
+    size = 0
+    start = 0
+
+    def flush() -> Optional[str]:
+        text = "".join(chunk)
+        if fence is not None:
+            if not text.endswith("\n"):
+                text += "\n"
+            text += FENCE
+        text = text.rstrip()
+        if text == "" or (fence is not None and text == fence + "\n" + FENCE):
+            return None
+        return text
+
+    def reset() -> int:
+        chunk.clear()
+        if fence is not None:
+            chunk.append(fence + "\n")
+            return len(fence) + 1
+        return 0
+
+    while start < len(content):
+        end = content.find("\n", start)
+        end = len(content) if end == -1 else end + 1
+        # Long lines are walked with an offset, slicing off their rest on
+        # each chunk would copy it again and again
+        offset = start
+        start = end
+
+        while size + end - offset + reserve > limit:
+            fresh = len(fence) + 1 if fence is not None else 0
+            if size > fresh and fresh + end - offset + reserve <= limit:
+                text = flush()
+                if text is not None:
+                    yield text
+                size = reset()
+                continue
+            room = limit - size - reserve
+            chunk.append(content[offset:offset + room])
+            offset += room
+            text = flush()
+            if text is not None:
+                yield text
+            size = reset()
+        line = content[offset:end]
+        chunk.append(line)
+        size += len(line)
+
+        if line.lstrip().startswith(FENCE):
+            if fence is None:
+                opening = line.strip()
+                fence = (opening if len(opening) <= MAX_FENCE_LENGTH
+                         else FENCE)
+            else:
+                fence = None
+
+    text = flush()
+    if text is not None:
+        yield text
 
-from discord.commands.context import ApplicationContext
-from typing import List
 
 class Message:
-    _content: List[str]
+    _content: str
+    _max_size: Optional[int]
 
-    def __init__(self, content):
+    def __init__(self, content, max_size: Optional[int] = None):
         if not isinstance(content, str):
             content = str(content)
-        self._content = []
-        last_line = -1
-        next_line = -1
-        i = 0
-        while i < len(content):
-            if content[i] == '\n':
-                if i - last_line < 2000:
-                    next_line = i
-                else:
-                    self._content.append(content[last_line+1:next_line])
-                    last_line = next_line
-                    next_line = i
-            i += 1
-        self._content.append(content[last_line+1:])
-
-        if self._content == []:
-            self._content = [" "]
-
-    async def send(self, ctx: ApplicationContext):
-        await ctx.respond(self._content[0])
-
-        for msg in self._content[1:]:
-            await ctx.send(msg)
+        self._content = content
+        self._max_size = max_size
+
+    def _as_file(self) -> Optional[File]:
+        if not self._max_size or len(self._content) <= self._max_size:
+            return None
+        return File(BytesIO(self._content.encode("utf-8")),
+                    filename="message.txt")
+
+    def chunks(self) -> Iterator[str]:
+        """
+        The chunks of the message, lazily
+
+        :returns:   The chunks
+        :rtype:     Iterator[str]
+        """
+        empty = True
+        for chunk in split_message(self._content):
+            empty = False
+            yield chunk
+        if empty:
+            yield "_ _"
+
+    async def send_to(self, channel: Messageable):
+        file = self._as_file()
+        if file is not None:
+            await channel.send(file=file)
+            return
+
+        for msg in self.chunks():
+            await channel.send(msg)
@@ -4,20 +4,32 @@
 # @Last Modified by:   Ultraxime
 # @Last Modified time: 2023-03-18 13:41:17
 
-from typing import Union
+import asyncio
+from time import monotonic
+from typing import Awaitable, Callable, List, Optional, TypeVar
 
 from discord.ext.commands import slash_command
 from discord.commands import Option
-from discord import ApplicationContext, Member, User, ButtonStyle
+from discord import ApplicationContext, AutocompleteContext, ButtonStyle
 from discord.ui import View, button, Item
 
-import zmq
-import zmq.asyncio
-from zmq.asyncio import Socket
-
 from .default import DefaultCommandGroup
-from ..ssh_keys import SshKey, SshKeyConverter, SshKeyDict
-from .message import Message
+from ..permissions import MissingPermission
+from ..ssh_client import SshMaintainerClient
+from ..ssh_mirror import SshKeyMirror
+from ..ssh_keys import SshKey, SshKeyConverter, SshKeyDict, SshKeyIndex
+from .key_list import KeyListView
+
+
+# Permission required by the ssh commands
+PERMISSION = "sys_admin"
+# Discord shows at most 25 choices
+MAX_CHOICES = 25
+# Age, in seconds, after which the keys of the last listing are refreshed for
+# the autocompletion, when the mirror is not in sync
+INDEX_TTL = 30
+
+T = TypeVar("T")
 
 
 class ValidationView(View):
@@ -30,42 +42,107 @@ class ValidationView(View):
         super().__init__(*items, timeout=timeout,
                          disable_on_timeout=disable_on_timeout)
 
+    # The click is acknowledged before the callbacks, which may wait for
+    # ssh-maintainer longer than discord waits for the acknowledgement
+
     @button(label="Yes", style=ButtonStyle.success)
     async def success_callback(self, _, interaction):
         self.stop()
-        await self._on_success()
         self.disable_all_items()
         await interaction.response.edit_message(view=self)
+        await self._on_success()
 
     @button(label="No", style=ButtonStyle.danger)
     async def faillure_callback(self, _, interaction):
         self.stop()
-        await self._on_failure()
         self.disable_all_items()
         await interaction.response.edit_message(view=self)
+        await self._on_failure()
 
     async def on_timeout(self):
         await self._on_failure()
         await super().on_timeout()
 
 
+async def autocomplete_key_name(ctx: AutocompleteContext) -> List[str]:
+    """
+    Autocompletes the name of a key with the existing ones
+
+    :param      ctx:  The context
+    :type       ctx:  AutocompleteContext
+
+    :returns:   The names starting with the value typed so far
+    :rtype:     List[str]
+    """
+    group = ctx.command.parent if ctx.command is not None else None
+    if not isinstance(group, Ssh):
+        return []
+    # The names of the keys are only shown to whom may use the commands, and
+    # the others do not trigger listings
+    if not ctx.bot.may(ctx.interaction.guild, ctx.interaction.user,
+                       PERMISSION):
+        return []
+    return group.complete_key_name(ctx.value or "")
+
+
 class Ssh(DefaultCommandGroup):
-    _socket: Socket
+    _client: SshMaintainerClient
+    _mirror: SshKeyMirror
+    _index: Optional[SshKeyIndex]
+    _index_time: float
+    _refresh: Optional[asyncio.Future]
 
     def __init__(self, bot):
         super().__init__(bot, "ssh-key", description="SSH related commands")
-        context = zmq.asyncio.Context()                     # pylint: disable=E0110
-        self._socket = context.socket(zmq.REQ)
-        self._socket.connect("tcp://" + self._bot.get_param("sockets.ssh.ip")
-                             + ":"
-                             + str(self._bot.get_param("sockets.ssh.port")))
+        self._client = SshMaintainerClient(bot)
+        self._mirror = SshKeyMirror(bot)
+        self._index = None
+        self._index_time = 0.0
+        self._refresh = None
+
+    def complete_key_name(self, prefix: str) -> List[str]:
+        """
+        Gets the names of the keys starting with a prefix, from the mirror or
+        the last listing, without waiting for ssh-maintainer
+
+        :param      prefix:  The prefix
+        :type       prefix:  str
+
+        :returns:   The first names starting with the prefix
+        :rtype:     List[str]
+        """
+        index = self._mirror.index
+        if index is None:
+            if (monotonic() - self._index_time > INDEX_TTL
+                    and (self._refresh is None or self._refresh.done())):
+                self._refresh = asyncio.ensure_future(self._list_key())
+                # Retrieves the exception, so it is not logged as never
+                # retrieved, the listing is retried on the next keystroke
+                self._refresh.add_done_callback(
+                    lambda future: future.cancelled() or future.exception())
+            index = self._index
+        if index is None:
+            return []
+        start, stop = index.prefix_range(prefix)
+        return index.paths(start, min(stop, start + MAX_CHOICES))
+
+    def close(self) -> None:
+        """
+        Closes the connection to ssh-maintainer, if it was opened
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._mirror.stop()
+        self._client.close()
 
     @slash_command(name = "del", description = "Removes the given ssh key")
     async def on_del_key(self, ctx: ApplicationContext,
                          key_name: Option(str,
                             description=("Name of the key to be deleted. "
                                          + "Should be of the form "
-                                         + "main_name/sub_name/..."))) -> None:
+                                         + "main_name/sub_name/..."),
+                            autocomplete=autocomplete_key_name)) -> None:
         """
         Called on delete key.
 
@@ -78,29 +155,23 @@ class Ssh(DefaultCommandGroup):
         :rtype:     None
         """
         self._command_used(ctx, "/ssh-key del", key_name)
+        await ctx.defer()
 
-        assert isinstance(ctx.author, Union[User, Member])
-
-        if not await self._bot.has_permission(ctx,
-                                              ctx.author,
-                                              "sys_admin"):
-            await ctx.respond(
-                "You don,t have the right to perform this command")
-            return
-        if key_name in await self._list_key():
+        if key_name in await self._authorized(ctx, self._keys):
             async def success():
                 if await self._del_key(key_name):
-                    await ctx.respond(key_name + " was deleted with success.")
+                    await ctx.followup.send(key_name
+                                            + " was deleted with success.")
                 else:
-                    await ctx.respond("An error occured during the deletion of "
-                                      + key_name)
+                    await ctx.followup.send(
+                        "An error occured during the deletion of " + key_name)
             async def failure():
-                await ctx.respond(key_name + " was not deleted.")
-            await ctx.respond("Do you want to destroy the key "
-                              + key_name,
-                              view=ValidationView(success, failure))
+                await ctx.followup.send(key_name + " was not deleted.")
+            await ctx.followup.send("Do you want to destroy the key "
+                                    + key_name,
+                                    view=ValidationView(success, failure))
         else:
-            await ctx.respond(key_name + " does not exists.")
+            await ctx.followup.send(key_name + " does not exists.")
 
     @slash_command(name="add",
                    description="Adds a ssh key")
@@ -110,7 +181,8 @@ class Ssh(DefaultCommandGroup):
                             description=(
                                 "Name of the key to be added. "
                                 + "Should be of the form "
-                                + "main_name/sub_name/...")),
+                                + "main_name/sub_name/..."),
+                            autocomplete=autocomplete_key_name),
                          key: Option(SshKeyConverter,
                                      description="Key to be added")) -> None:
         """
@@ -129,66 +201,80 @@ class Ssh(DefaultCommandGroup):
         :raises     AssertionError:  Issues with the typing of the ZMQ lib
         """
         self._command_used(ctx, "/ssh-key add", key_name, key)
+        await ctx.defer()
 
-        assert isinstance(ctx.author, Union[User, Member])
         assert isinstance(key, SshKey)
-
-        if not await self._bot.has_permission(ctx,
-                                              ctx.author,
-                                              "sys_admin"):
-            await ctx.respond(
-                "You don,t have the right to perform this command")
-            return
-        if key_name in await self._list_key():
+        if key_name in await self._authorized(ctx, self._keys):
             async def success():
                 if await self._del_key(key_name):
                     if await self._add_key(key_name, key):
-                        await ctx.respond(key_name
-                                          + " was added with success.")
+                        await ctx.followup.send(key_name
+                                                + " was added with success.")
                     else:
-                        await ctx.respond(
+                        await ctx.followup.send(
                             "An error occured during the adding of "
                             + key_name)
                 else:
-                    await ctx.respond(
+                    await ctx.followup.send(
                         "An error occured during the deletion of " + key_name)
             async def failure():
-                await ctx.respond(
+                await ctx.followup.send(
                     key_name
                     + " was not added because of "
                     + "a pre-existing key with the same name.")
-            await ctx.respond("Do you want to destroy the key "
-                              + key_name,
-                              view=ValidationView(success, failure))
+            await ctx.followup.send("Do you want to destroy the key "
+                                    + key_name,
+                                    view=ValidationView(success, failure))
         elif await self._add_key(key_name, key):
-            await ctx.respond(key_name + " was added with success.")
+            await ctx.followup.send(key_name + " was added with success.")
         else:
-            await ctx.respond("An error occured during the adding of "
-                              + key_name)
+            await ctx.followup.send("An error occured during the adding of "
+                                    + key_name)
 
     @slash_command(name="list",
                    description="List the ssh keys")
-    async def on_list_keys(self, ctx: ApplicationContext) -> None:
-        self._command_used(ctx, "/ssh-key list")
-
-        assert isinstance(ctx.author, Union[User, Member])
-        if not await self._bot.has_permission(ctx,
-                                              ctx.author,
-                                              "sys_admin"):
-            await ctx.respond(
-                "You don,t have the right to perform this command")
-            return
-        content = await self._list_key()
-        if content == "":
-            content = "There are no keys."
-        msg = Message(content)
-        await msg.send(ctx)
+    async def on_list_keys(self, ctx: ApplicationContext,
+                           prefix: Option(
+                               str,
+                               description=("Only list the keys whose name "
+                                            + "starts with this prefix"),
+                               default="")) -> None:
+        self._command_used(ctx, "/ssh-key list", prefix)
+        await ctx.defer()
+
+        view = KeyListView(await self._authorized(ctx, self._keys_index),
+                           prefix, ctx.author.id)
+        await ctx.followup.send(embed=view.render(), view=view)
+
+    async def _authorized(self, ctx: ApplicationContext,
+                          fetch: Callable[[], Awaitable[T]]) -> T:
+        """
+        Fetches the keys once the permission of the author is checked
+
+        :param      ctx:    The context
+        :type       ctx:    ApplicationContext
+        :param      fetch:  The fetching of the keys
+        :type       fetch:  Callable[[], Awaitable[T]]
+
+        :returns:   The keys
+        :rtype:     T
+
+        :raises     MissingPermission:  When the author lacks the permission
+        """
+        # The check is a lookup in memory, a denied author costs no request
+        if not await self._bot.has_permission(ctx, ctx.author, PERMISSION):
+            raise MissingPermission(PERMISSION)
+        return await fetch()
 
     async def _add_key(self, key_name: str, key: SshKey):
-        self._socket.send_pyobj({"ADD": SshKeyDict({key_name: key})})
-        msg = await self._socket.recv_pyobj()
+        msg = await self._client.request(
+            {"ADD": SshKeyDict({key_name: key})}, "ADD")
         match msg:
             case "ACK":
+                # The autocompletion follows the changes made by the bot
+                # until the next listing
+                if self._index is not None:
+                    self._index.insert(key_name)
                 return True
             case "FAIL":
                 return False
@@ -196,23 +282,50 @@ class Ssh(DefaultCommandGroup):
                 raise ValueError(msg + " is not a valid message")
 
     async def _del_key(self, key_name) -> bool:
-        self._socket.send_pyobj({"DEL": key_name})
-        msg = await self._socket.recv_pyobj()
+        msg = await self._client.request({"DEL": key_name}, "DEL")
         match msg:
             case "ACK":
+                if self._index is not None:
+                    self._index.discard(key_name)
                 return True
             case "FAIL":
                 return False
             case _:
                 raise ValueError(msg + " is not a valid message")
 
+    async def _keys(self) -> SshKeyDict:
+        self._mirror.start()
+        tree = self._mirror.tree
+        if tree is not None:
+            return tree
+        return await self._list_key()
+
+    async def _keys_index(self) -> SshKeyIndex:
+        self._mirror.start()
+        index = self._mirror.index
+        if index is not None:
+            return index
+        await self._list_key()
+        assert self._index is not None
+        return self._index
+
     async def _list_key(self) -> SshKeyDict:
-        print("asking list")
-        self._socket.send_pyobj("LIST")
-        print("waiting list")
-        liste = await self._socket.recv_pyobj()
-        print("list received")
+        self._bot.audit.event("ssh", "LIST")
+        liste = await self._client.request("LIST", "LIST")
         assert isinstance(liste, dict)
         assert len(liste) == 1
         assert isinstance(liste["LIST"], SshKeyDict)
+        self._index = await SshKeyIndex.build_async(liste["LIST"])
+        self._index_time = monotonic()
         return liste["LIST"]
+
+
+def setup(bot):
+    bot.add_application_command(Ssh(bot))
+
+
+def teardown(bot):
+    for command in list(bot.pending_application_commands):
+        if isinstance(command, Ssh):
+            bot.remove_application_command(command)
+            command.close()
@@ -76,6 +76,10 @@ class Config:
                 try:
                     value = Config(os.path.join(DEFAULT_CONFIG_PATH,
                                                 "discord-bot.yml")).get(key)
+                    # Sections added since the config file was created are
+                    # missing from it
+                    if len(keys) > 1:
+                        self.__add_key(self.__content, keys[:-1])
                     self.set(key, value)
                     return value
                 except KeyError:
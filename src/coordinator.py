@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-27 14:26:19
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-27 14:26:19
+
+"""
+Module coordinating the processes of a sharded bot.
+
+The coordinator receives the messages of the socket in place of the bot,
+routes them, and hands each delivery to the process whose shards own the
+guild of the destination channel. The processes register the channels they
+own periodically, and are forgotten when they stop doing so.
+"""
+
+import json
+import sys
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+import zmq
+import zmq.asyncio
+
+from .config import Config
+from .routing import FALL_BACK, Router, parse_destination, parse_message
+
+
+class Coordinator:
+    """
+    Class coordinating the processes of a sharded bot
+    """
+    _config: Config
+    _router: Router
+    _owners: Dict[int, bytes]
+    _registered: Dict[bytes, float]
+    _deliveries: int
+
+    def __init__(self, config: Config):
+        self._config = config
+        self._router = Router(config.get("routing"))
+        self._owners = {}
+        self._registered = {}
+        self._deliveries = 0
+
+    def _channel_id(self, name: str) -> Optional[int]:
+        """
+        Resolves a channel of the config file, with the fall back channels
+
+        :param      name:  The name of the channel (log, warn, ...)
+        :type       name:  str
+
+        :returns:   The id of the channel, None if neither it nor its fall
+                    backs are set
+        :rtype:     Optional[int]
+        """
+        channel_id = self._config.get(f"channels.{name}")
+        if channel_id is not None and channel_id != "":
+            if int(channel_id) in self._owners or name not in FALL_BACK:
+                return int(channel_id)
+        if name in FALL_BACK:
+            return self._channel_id(FALL_BACK[name])
+        return None
+
+    def deliveries(self, level: str, body: str, source: Optional[str]
+                   ) -> List[Tuple[bytes, int]]:
+        """
+        Finds the deliveries of a message
+
+        :param      level:   The level
+        :type       level:   str
+        :param      body:    The body
+        :type       body:    str
+        :param      source:  The source
+        :type       source:  Optional[str]
+
+        :returns:   The process and the channel of each delivery
+        :rtype:     List[Tuple[bytes, int]]
+        """
+        destinations = self._router.route(level, body, source) \
+            or (level.lower(),)
+        deliveries = []
+        for destination in destinations:
+            target = parse_destination(destination)
+            if isinstance(target, str):
+                target = self._channel_id(target)
+            if target is None:
+                print(f"Unable to route to {destination}: no channel",
+                      file=sys.stderr)
+                continue
+            owner = self._owners.get(target)
+            if owner is None:
+                # Archived threads are not cached by any process,
+                # any of them can fetch it
+                if len(self._owners) == 0:
+                    print(f"Unable to route to {destination}: no process",
+                          file=sys.stderr)
+                    continue
+                owner = next(iter(self._owners.values()))
+            deliveries.append((owner, target))
+        return deliveries
+
+    def _forget(self, identity: bytes) -> None:
+        for channel, owner in list(self._owners.items()):
+            if owner == identity:
+                del self._owners[channel]
+        self._registered.pop(identity, None)
+
+    def _register(self, identity: bytes, channels: List[int]) -> None:
+        self._forget(identity)
+        for channel in channels:
+            self._owners[channel] = identity
+        self._registered[identity] = monotonic()
+
+    def expire(self) -> None:
+        """
+        Forgets the processes which missed their last registrations, ZMQ would
+        silently drop the messages sent to them
+
+        :returns:   None
+        :rtype:     None
+        """
+        # A process is given three registration intervals
+        limit = monotonic() - 3 * float(
+            self._config.get("sharding.register_interval"))
+        for identity, registered in list(self._registered.items()):
+            if registered < limit:
+                print("A process stopped registering, forgetting it",
+                      file=sys.stderr)
+                self._forget(identity)
+
+    def stats(self) -> str:
+        processes = len(self._registered)
+        return ("# TYPE discord_bot_coordinator_processes gauge\n"
+                + f"discord_bot_coordinator_processes {processes}\n"
+                + "# TYPE discord_bot_coordinator_deliveries_total counter\n"
+                + f"discord_bot_coordinator_deliveries_total "
+                + f"{self._deliveries}\n")
+
+    async def run(self) -> None:
+        """
+        Runs the coordinator, forever
+
+        :returns:   None
+        :rtype:     None
+        """
+        context = zmq.asyncio.Context()         # pylint: disable=E0110
+        ingestion = context.socket(zmq.REP)
+        port = self._config.get("sockets.ssh.bind_port")
+        if port is None or port == "":
+            port = self._config.get("sockets.ssh.port")
+        ingestion.bind("tcp://*:" + str(port))
+        shards = context.socket(zmq.ROUTER)
+        shards.bind("tcp://*:"
+                    + str(self._config.get("sharding.coordinator.port")))
+
+        poller = zmq.asyncio.Poller()
+        poller.register(ingestion, zmq.POLLIN)
+        poller.register(shards, zmq.POLLIN)
+        while True:
+            events = dict(await poller.poll())
+            if shards in events:
+                msg = await shards.recv_multipart()
+                if len(msg) == 3 and msg[1] == b"CHANNELS":
+                    try:
+                        self._register(msg[0], [int(channel) for channel
+                                                in json.loads(msg[2])])
+                    except (ValueError, TypeError) as error:
+                        print(f"Invalid registration: {error}",
+                              file=sys.stderr)
+                else:
+                    print("Invalid message from a process", file=sys.stderr)
+            if ingestion in events:
+                msg = await ingestion.recv_multipart()
+                if len(msg) > 0 and msg[0] == b"STATS":
+                    await ingestion.send_multipart(
+                        [b"ACK", self.stats().encode("utf-8")])
+                    continue
+                parsed = parse_message(msg)
+                if parsed is None:
+                    await ingestion.send_multipart([b"FAIL",
+                                                    b"Unvalid message"])
+                    continue
+                self.expire()
+                if len(self._owners) == 0:
+                    # Refused rather than dropped, the producer can retry
+                    await ingestion.send_multipart([b"FAIL",
+                                                    b"No process to deliver"])
+                    continue
+                await ingestion.send_multipart([b"ACK"])
+                level, body, source = parsed
+                for owner, channel in self.deliveries(level, body, source):
+                    self._deliveries += 1
+                    await shards.send_multipart(
+                        [owner, b"SEND", level.encode("utf-8"),
+                         (source or "").encode("utf-8"),
+                         body.encode("utf-8"), str(channel).encode("utf-8")])
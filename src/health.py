@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-24 15:17:33
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-24 15:17:33
+
+"""Module probing the health of the bot"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import zmq
+import zmq.asyncio
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+
+class HealthProbe:
+    """
+    Class answering the PING of the healthcheck with the state of the bot.
+
+    The lag of the event loop is measured by the drift of a periodic timer.
+    """
+    _bot: Bot
+    _endpoint: str
+    _interval: float
+    _max_lag: float
+    _max_send_age: float
+    lag: float
+
+    def __init__(self, bot: Bot, endpoint: str, interval: float = 0.5,
+                 max_lag: float = 1.0, max_send_age: float = 60.0):
+        # pylint: disable=R0913
+        self._bot = bot
+        self._endpoint = endpoint
+        self._interval = interval
+        self._max_lag = max_lag
+        self._max_send_age = max_send_age
+        self.lag = 0.0
+
+    async def sample_lag(self) -> None:
+        """
+        Measures the lag of the event loop, forever
+
+        :returns:   None
+        :rtype:     None
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self._interval)
+            self.lag = max(0.0, loop.time() - start - self._interval)
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Gets the state of the bot
+
+        :returns:   The state, with a status "ok" or "degraded" and the
+                    reasons of the degradation
+        :rtype:     Dict[str, Any]
+        """
+        bot = self._bot
+        queue_depth = bot.metrics.zmq_queue_depth.get()
+        last_send = bot.last_send
+        send_age = None if last_send is None else monotonic() - last_send
+        gateway = ("closed" if bot.is_closed()
+                   else "ready" if bot.is_ready() else "connecting")
+
+        problems = []
+        if gateway != "ready" or not math.isfinite(bot.latency):
+            problems.append("gateway " + gateway)
+        if self.lag > self._max_lag:
+            problems.append(f"event loop lag {self.lag:.3f}s")
+        if not bot.ingestion_running:
+            problems.append("zmq loop stopped")
+        if queue_depth > 0 and (send_age is None
+                                or send_age > self._max_send_age):
+            problems.append("messages not sent")
+
+        return {"status": "degraded" if problems else "ok",
+                "problems": problems,
+                "gateway": gateway,
+                "latency": bot.latency if math.isfinite(bot.latency) else None,
+                "lag": self.lag,
+                "queue_depth": queue_depth,
+                "last_send_age": send_age}
+
+    async def serve(self) -> None:
+        """
+        Answers the PING on the endpoint, forever
+
+        :returns:   None
+        :rtype:     None
+        """
+        context = zmq.asyncio.Context()         # pylint: disable=E0110
+        socket = context.socket(zmq.REP)
+        socket.bind(self._endpoint)
+        sampler = asyncio.ensure_future(self.sample_lag())
+        try:
+            while True:
+                msg = await socket.recv()
+                if msg == b"PING":
+                    await socket.send(json.dumps(self.state()).encode("utf-8"))
+                else:
+                    await socket.send(b"{}")
+        finally:
+            sampler.cancel()
+            socket.close(linger=0)
+
+
+def process_endpoint(endpoint: str, shard_ids: Optional[List[int]]) -> str:
+    """
+    Gets the endpoint of the probe of a process running some of the shards,
+    its port is shifted by the first of them, so the processes of a host do
+    not bind the same one
+
+    :param      endpoint:   The endpoint of the config file
+    :type       endpoint:   str
+    :param      shard_ids:  The shards of the process, empty for all
+    :type       shard_ids:  Optional[List[int]]
+
+    :returns:   The endpoint of the process
+    :rtype:     str
+    """
+    if not shard_ids:
+        return endpoint
+    address, port = endpoint.rsplit(":", 1)
+    return f"{address}:{int(port) + min(int(shard) for shard in shard_ids)}"
+
+
+def query(endpoint: str, timeout: float = 1.5) -> Optional[Dict[str, Any]]:
+    """
+    Sends a PING to the probe of a running bot
+
+    :param      endpoint:  The endpoint of the probe
+    :type       endpoint:  str
+    :param      timeout:   The timeout, in seconds
+    :type       timeout:   float
+
+    :returns:   The state of the bot, None if it did not answer in time
+    :rtype:     Optional[Dict[str, Any]]
+    """
+    context = zmq.Context()
+    socket = context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.setsockopt(zmq.SNDTIMEO, int(timeout * 1000))
+    socket.setsockopt(zmq.RCVTIMEO, int(timeout * 1000))
+    try:
+        socket.connect(endpoint)
+        socket.send(b"PING")
+        return json.loads(socket.recv())
+    except (zmq.ZMQError, ValueError):
+        return None
+    finally:
+        socket.close()
+        context.term()
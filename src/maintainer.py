@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-30 10:18:55
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-30 10:18:55
+
+"""
+Reference ssh-maintainer, serving the keys of an authorized_keys file.
+
+It answers the requests of the bot on a ROUTER socket:
+    {"ADD": SshKeyDict} -> "ACK" or "FAIL"
+    {"DEL": key_name}   -> "ACK" or "FAIL"
+    "LIST"              -> {"LIST": SshKeyDict}
+    "SNAPSHOT"          -> {"SNAPSHOT": SshKeyDict, "EPOCH": epoch, "SEQ": seq}
+and publishes the changes as described in src.ssh_mirror. The changes
+received together are written to the file at once (group commit), by
+replacing it atomically, before being published and acknowledged. The
+listings received meanwhile are answered after the commit, so they never
+show uncommitted keys.
+"""
+
+import asyncio
+import os
+import pickle
+import sys
+import uuid
+from time import monotonic
+from typing import Any, List, Optional, Tuple
+
+import zmq
+import zmq.asyncio
+
+from .config import Config
+from .ssh_keys import SshKey, SshKeyDict, SshKeyIndex, dumps_async
+
+
+class Maintainer:
+    """
+    Class serving the keys of an authorized_keys file
+    """
+    # pylint: disable=R0902
+    _path: Optional[str]
+    _tree: SshKeyDict
+    _index: SshKeyIndex
+    _epoch: bytes
+    _seq: int
+    _replies: List[Tuple[bytes, bytes, str]]
+    _reads: List[Tuple[bytes, bytes, Any]]
+    _events: List[Tuple[int, dict]]
+
+    def __init__(self, path: Optional[str] = "/authorized_key",
+                 port: int = 25564, publish_port: Optional[int] = 25567,
+                 heartbeat: float = 5.0, commit_interval: float = 0.05):
+        # pylint: disable=R0913
+        self._path = path
+        if path is not None and os.path.exists(path) \
+                and os.path.getsize(path) > 0:
+            self._tree = SshKeyDict.open(path)
+        else:
+            self._tree = SshKeyDict({})
+        self._index = SshKeyIndex(self._tree)
+        self._port = port
+        self._publish_port = publish_port
+        self._heartbeat = heartbeat
+        self._commit_interval = commit_interval
+        self._epoch = uuid.uuid4().hex.encode("utf-8")
+        self._seq = 0
+        self._replies = []
+        self._reads = []
+        self._events = []
+
+    @classmethod
+    def from_config(cls, config: Config) -> "Maintainer":
+        """
+        Creates the maintainer described by a config file
+
+        :param      config:  The config
+        :type       config:  Config
+
+        :returns:   The maintainer
+        :rtype:     Maintainer
+        """
+        publish_port = config.get("sockets.ssh.publish_port")
+        return cls(config.get("maintainer.path") or None,
+                   int(config.get("sockets.ssh.port")),
+                   None if publish_port in (None, "") else int(publish_port),
+                   float(config.get("sockets.ssh.heartbeat")),
+                   float(config.get("maintainer.commit_interval")))
+
+    @property
+    def tree(self) -> SshKeyDict:
+        return self._tree
+
+    @staticmethod
+    def _valid_name(key_name: str) -> bool:
+        return all(key_name.split("/"))
+
+    def _can_add(self, key_name: str) -> bool:
+        node: Any = self._tree
+        for key in key_name.split("/"):
+            if not isinstance(node, SshKeyDict):
+                return False
+            if key not in node:
+                return True
+            node = node[key]
+        return isinstance(node, SshKey)
+
+    def add(self, addition: SshKeyDict) -> bool:
+        """
+        Adds keys, replacing the existing ones with the same names
+
+        :param      addition:  The keys
+        :type       addition:  SshKeyDict
+
+        :returns:   True on success, False if a name is empty or has an
+                    empty part, or is already used by a group of keys, or a
+                    part of a name by a key
+        :rtype:     bool
+        """
+        key_names = addition.list_key()
+        if not all(self._valid_name(key_name) and self._can_add(key_name)
+                   for key_name in key_names):
+            return False
+        replaced = [key_name for key_name in key_names
+                    if key_name in self._index]
+        self._tree.add(addition)
+        for key_name in key_names:
+            self._index.insert(key_name)
+        self._record({"DEL": replaced, "ADD": addition})
+        return True
+
+    def remove(self, key_name: str) -> bool:
+        """
+        Removes a key
+
+        :param      key_name:  The name of the key
+        :type       key_name:  str
+
+        :returns:   True on success, False if there is no such key
+        :rtype:     bool
+        """
+        if (not self._valid_name(key_name) or key_name not in self._index
+                or not self._tree.remove(key_name)):
+            return False
+        self._index.discard(key_name)
+        self._record({"DEL": [key_name], "ADD": SshKeyDict({})})
+        return True
+
+    def _record(self, event: dict) -> None:
+        self._seq += 1
+        self._events.append((self._seq, event))
+
+    def handle(self, request: Any) -> Any:
+        """
+        Handles a request
+
+        :param      request:  The request
+        :type       request:  Any
+
+        :returns:   The answer
+        :rtype:     Any
+        """
+        if request == "LIST":
+            return {"LIST": self._tree}
+        if request == "SNAPSHOT":
+            return {"SNAPSHOT": self._tree,
+                    "EPOCH": self._epoch.decode("utf-8"),
+                    "SEQ": self._seq}
+        if isinstance(request, dict) and len(request) == 1:
+            if isinstance(request.get("ADD"), SshKeyDict):
+                return "ACK" if self.add(request["ADD"]) else "FAIL"
+            if isinstance(request.get("DEL"), str):
+                return "ACK" if self.remove(request["DEL"]) else "FAIL"
+        return "FAIL"
+
+    async def commit(self) -> None:
+        """
+        Writes the keys to the file, atomically
+
+        :returns:   None
+        :rtype:     None
+        """
+        if self._path is None:
+            return
+        content = await self._tree.repr_async()
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write, content)
+
+    def _write(self, content: str) -> None:
+        assert self._path is not None
+        temporary = self._path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self._path)
+
+    async def run(self) -> None:
+        """
+        Serves the requests, forever
+
+        :returns:   None
+        :rtype:     None
+        """
+        context = zmq.asyncio.Context()         # pylint: disable=E0110
+        socket = context.socket(zmq.ROUTER)
+        socket.bind(f"tcp://*:{self._port}")
+        publisher = None
+        if self._publish_port is not None:
+            publisher = context.socket(zmq.PUB)
+            publisher.bind(f"tcp://*:{self._publish_port}")
+        next_heartbeat = monotonic()
+        try:
+            while True:
+                # Without publisher there is no heartbeat to wake up for
+                timeout = None if publisher is None \
+                    else max(0.0, next_heartbeat - monotonic()) * 1000
+                if await socket.poll(timeout):
+                    await self._serve_batch(socket)
+                    if self._replies:
+                        await self._commit_batch(socket, publisher)
+                if publisher is not None and monotonic() >= next_heartbeat:
+                    await publisher.send_multipart(
+                        [b"HEARTBEAT", self._epoch,
+                         str(self._seq).encode("utf-8")])
+                    next_heartbeat = monotonic() + self._heartbeat
+        finally:
+            socket.close(linger=0)
+            if publisher is not None:
+                publisher.close(linger=0)
+
+    async def _serve_batch(self, socket: zmq.asyncio.Socket) -> None:
+        # Every request received during the commit interval is part of the
+        # same commit
+        deadline = monotonic() + self._commit_interval
+        while True:
+            try:
+                msg = await socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                if monotonic() >= deadline or not self._replies:
+                    return
+                await socket.poll((deadline - monotonic()) * 1000)
+                continue
+            if len(msg) != 3:
+                print("Invalid request: not a REQ envelope", file=sys.stderr)
+                continue
+            identity, empty, payload = msg
+            try:
+                request = pickle.loads(payload)
+                if self._events and request in ("LIST", "SNAPSHOT"):
+                    # Answered once the pending changes are committed
+                    self._reads.append((identity, empty, request))
+                    continue
+                answer = self.handle(request)
+            except (pickle.UnpicklingError, ValueError, KeyError,
+                    EOFError) as error:
+                print(f"Invalid request: {error}", file=sys.stderr)
+                answer = "FAIL"
+            if isinstance(answer, str):
+                # Writes are only acknowledged once committed
+                self._replies.append((identity, empty, answer))
+            else:
+                await socket.send_multipart(
+                    [identity, empty,
+                     await dumps_async(answer, self._tree.weight())])
+
+    async def _commit_batch(self, socket: zmq.asyncio.Socket,
+                            publisher: Optional[zmq.asyncio.Socket]) -> None:
+        events, self._events = self._events, []
+        replies, self._replies = self._replies, []
+        reads, self._reads = self._reads, []
+        if events:
+            try:
+                await self.commit()
+            except OSError as error:
+                print(f"Unable to write the keys: {error}", file=sys.stderr)
+                # Nothing of the batch is acknowledged nor published
+                await self._rollback(events[0][0] - 1)
+                replies = [(identity, empty, "FAIL")
+                           for identity, empty, _ in replies]
+                events = []
+        # Published first, so the mirror of a writer has its change by the
+        # time the writer gets its answer
+        if publisher is not None:
+            for seq, event in events:
+                await publisher.send_multipart(
+                    [b"EVENT", self._epoch, str(seq).encode("utf-8"),
+                     pickle.dumps(event)])
+        for identity, empty, answer in replies:
+            await socket.send_multipart([identity, empty,
+                                         pickle.dumps(answer)])
+        for identity, empty, request in reads:
+            await socket.send_multipart(
+                [identity, empty,
+                 await dumps_async(self.handle(request),
+                                   self._tree.weight())])
+
+    async def _rollback(self, seq: int) -> None:
+        # The mirrors may have seen the rolled back changes in a snapshot,
+        # a new epoch makes them resync
+        self._epoch = uuid.uuid4().hex.encode("utf-8")
+        # The file holds the keys of the last commit
+        try:
+            if self._path is not None and os.path.exists(self._path) \
+                    and os.path.getsize(self._path) > 0:
+                tree = await SshKeyDict.open_async(self._path)
+            else:
+                tree = SshKeyDict({})
+            index = await SshKeyIndex.build_async(tree)
+        except OSError as error:
+            # The changes stay in memory, unpublished
+            print(f"Unable to reload the keys: {error}", file=sys.stderr)
+            return
+        self._tree = tree
+        self._index = index
+        self._seq = seq
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-23 10:41:55
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-23 10:41:55
+
+"""Module measuring the hot paths of the bot, in the Prometheus format"""
+
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(label: Optional[str], value: Optional[str]) -> str:
+    if label is None or value is None:
+        return ""
+    value = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'{{{label}="{value}"}}'
+
+
+class Counter:
+    """
+    Counter, optionally split by the value of one label
+    """
+    name: str
+    description: str
+    label: Optional[str]
+    _values: Dict[Optional[str], float]
+
+    def __init__(self, name: str, description: str,
+                 label: Optional[str] = None):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values = {}
+
+    def inc(self, label_value: Optional[str] = None,
+            amount: float = 1) -> None:
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def get(self, label_value: Optional[str] = None) -> float:
+        return self._values.get(label_value, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}",
+                 f"# TYPE {self.name} counter"]
+        for value, count in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label, value)} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose value is read from a function when rendered
+    """
+    name: str
+    description: str
+    _function: Callable[[], float]
+
+    def __init__(self, name: str, description: str,
+                 function: Callable[[], float]):
+        self.name = name
+        self.description = description
+        self._function = function
+
+    def get(self) -> float:
+        return self._function()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}",
+                f"# TYPE {self.name} gauge",
+                f"{self.name} {self.get()}"]
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets, optionally split by the value of one label
+    """
+    name: str
+    description: str
+    label: Optional[str]
+    _buckets: Tuple[float, ...]
+    _values: Dict[Optional[str], Tuple[List[int], List[float]]]
+
+    def __init__(self, name: str, description: str,
+                 label: Optional[str] = None,
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._buckets = buckets
+        self._values = {}
+
+    def observe(self, value: float, label_value: Optional[str] = None) -> None:
+        try:
+            counts, total = self._values[label_value]
+        except KeyError:
+            counts, total = [0] * (len(self._buckets) + 1), [0.0]
+            self._values[label_value] = (counts, total)
+        counts[bisect_left(self._buckets, value)] += 1
+        total[0] += value
+
+    def count(self, label_value: Optional[str] = None) -> int:
+        try:
+            return sum(self._values[label_value][0])
+        except KeyError:
+            return 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}",
+                 f"# TYPE {self.name} histogram"]
+        for value, (counts, total) in self._values.items():
+            prefix = _labels(self.label, value)[1:-1]
+            if prefix != "":
+                prefix += ","
+            cumulative = 0
+            for bound, count in zip(self._buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} '
+                             + str(cumulative))
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} '
+                         + str(cumulative))
+            labels = _labels(self.label, value)
+            lines.append(f"{self.name}_sum{labels} {total[0]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class RateLimitHandler(logging.Handler):
+    """
+    Logging handler counting the rate limits reported by discord.http
+    """
+
+    def __init__(self, counter: Counter):
+        self._counter = counter
+        super().__init__(logging.WARNING)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if (isinstance(record.msg, str)
+                and record.msg.startswith("We are being rate limited")
+                and len(record.args or ()) == 2):
+            assert isinstance(record.args, tuple)
+            # Buckets are channel_id:guild_id:path
+            self._counter.inc(str(record.args[1]).split(":")[0])
+
+
+class Metrics:
+    """
+    Class grouping the metrics of the bot
+    """
+    # pylint: disable=R0902
+    command_latency: Histogram
+    zmq_messages: Counter
+    zmq_queue_depth: Gauge
+    send_latency: Histogram
+    rate_limits: Counter
+    ssh_latency: Histogram
+
+    def __init__(self, queue_depth: Callable[[], float] = lambda: 0):
+        self.command_latency = Histogram(
+            "discord_bot_command_seconds",
+            "Latency of the slash commands", "command")
+        self.zmq_messages = Counter(
+            "discord_bot_zmq_messages_total",
+            "Messages received on the socket", "verb")
+        self.zmq_queue_depth = Gauge(
+            "discord_bot_zmq_queue_depth",
+            "Messages received on the socket and not yet sent", queue_depth)
+        self.send_latency = Histogram(
+            "discord_bot_send_seconds",
+            "Latency of the messages sent on Discord", "channel")
+        self.rate_limits = Counter(
+            "discord_bot_rate_limits_total",
+            "Rate limits hit on Discord", "channel")
+        self.ssh_latency = Histogram(
+            "discord_bot_ssh_seconds",
+            "Round trip time of the requests to ssh-maintainer", "request")
+        logging.getLogger("discord.http").addHandler(
+            RateLimitHandler(self.rate_limits))
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the Prometheus text format
+
+        :returns:   The metrics
+        :rtype:     str
+        """
+        lines = []
+        for metric in (self.command_latency, self.zmq_messages,
+                       self.zmq_queue_depth, self.send_latency,
+                       self.rate_limits, self.ssh_latency):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" \
+                    and parts[1] in (b"/metrics", b"/"):
+                status = "200 OK"
+                body = self.render().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b""
+            writer.write(f"HTTP/1.0 {status}\r\n".encode("utf-8")
+                         + b"Content-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n"
+                         .encode("utf-8")
+                         + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        """
+        Serves the metrics over HTTP
+
+        :param      host:  The host
+        :type       host:  str
+        :param      port:  The port
+        :type       port:  int
+
+        :returns:   The server
+        :rtype:     asyncio.AbstractServer
+        """
+        return await asyncio.start_server(self._handle, host, port)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-21 16:08:27
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-21 16:08:27
+
+"""Module resolving the permissions of the members"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Optional
+
+from discord import ApplicationContext, Guild, Member
+from discord.ext.commands import CheckFailure, check
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+
+class MissingPermission(CheckFailure):
+    """
+    Raised by the permission check when the author lacks the permission
+    """
+
+    def __init__(self, permission: str):
+        self.permission = permission
+        super().__init__(f"Missing the {permission} permission.")
+
+
+class PermissionResolver:
+    """
+    Class caching the resolution of the permissions of the config file.
+
+    The roles of each permission are computed once per guild, until the roles
+    of the guild or the config change. The roles of a member are not cached,
+    each interaction carries the current ones.
+    """
+    _get_param: Callable
+    _roles: Dict[int, Dict[str, Optional[FrozenSet[int]]]]
+
+    def __init__(self, get_param: Callable):
+        self._get_param = get_param
+        self._roles = {}
+
+    def roles(self, guild: Guild,
+              permission: str) -> Optional[FrozenSet[int]]:
+        """
+        Gets the roles granting a permission in a guild
+
+        :param      guild:       The guild
+        :type       guild:       Guild
+        :param      permission:  The permission
+        :type       permission:  str
+
+        :returns:   None if the permission is not restricted, the ids of the
+                    roles of the guild granting it otherwise (empty if none
+                    of the configured roles exists)
+        :rtype:     Optional[FrozenSet[int]]
+        """
+        guild_roles = self._roles.setdefault(guild.id, {})
+        try:
+            return guild_roles[permission]
+        except KeyError:
+            pass
+
+        role_ids = self._get_param("permission." + permission)
+        if role_ids is None or role_ids == "":
+            roles = None
+        else:
+            if not isinstance(role_ids, list):
+                role_ids = [role_ids]
+            roles = frozenset(int(role_id) for role_id in role_ids
+                              if guild.get_role(int(role_id)) is not None)
+        guild_roles[permission] = roles
+        return roles
+
+    @staticmethod
+    def allowed(member: Member, roles: FrozenSet[int]) -> bool:
+        """
+        Determines if the member has one of the roles of the permission
+
+        :param      member:      The member
+        :type       member:      Member
+        :param      roles:       The roles granting the permission
+        :type       roles:       FrozenSet[int]
+
+        :returns:   True if the member has the permission, False otherwise
+        :rtype:     bool
+        """
+        return any(role.id in roles for role in member.roles)
+
+    def invalidate_guild(self, guild: Guild) -> None:
+        """
+        Forgets the roles of a guild
+
+        :param      guild:  The guild
+        :type       guild:  Guild
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._roles.pop(guild.id, None)
+
+    def invalidate(self) -> None:
+        """
+        Forgets everything, to be called when the config changes
+
+        :returns:   None
+        :rtype:     None
+        """
+        self._roles.clear()
+
+
+def require(permission: str):
+    """
+    Check rejecting the command before its invocation when the author lacks
+    the permission
+
+    :param      permission:  The permission
+    :type       permission:  str
+
+    :returns:   The check decorator
+    """
+    async def predicate(ctx: ApplicationContext) -> bool:
+        bot: Bot = ctx.bot  # type: ignore
+        if not await bot.has_permission(ctx, ctx.author, permission):
+            raise MissingPermission(permission)
+        return True
+    return check(predicate)
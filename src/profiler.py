@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-25 10:05:48
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-25 10:05:48
+
+"""Module profiling the event loop of the bot"""
+
+import asyncio
+import os
+import sys
+import threading
+import traceback
+from collections import Counter
+from time import monotonic, sleep
+from types import FrameType
+from typing import Awaitable, Callable, Optional
+
+
+# Deepest part of a stack reported by the slow callback detector
+MAX_STACK_DEPTH = 20
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+def sample(thread_id: int, duration: float, interval: float = 0.005) -> str:
+    """
+    Samples the stack of a thread, to be run from another thread
+
+    :param      thread_id:  The identifier of the sampled thread
+    :type       thread_id:  int
+    :param      duration:   The duration of the sampling, in seconds
+    :type       duration:   float
+    :param      interval:   The interval between two samples, in seconds
+    :type       interval:   float
+
+    :returns:   The stacks in the collapsed format (one "stack count" per
+                line), as read by flamegraph.pl or speedscope
+    :rtype:     str
+    """
+    stacks: Counter = Counter()
+    end = monotonic() + duration
+    while monotonic() < end:
+        frame = sys._current_frames().get(thread_id)  # pylint: disable=W0212
+        if frame is None:
+            break
+        stacks[_collapse(frame)] += 1
+        del frame
+        sleep(interval)
+    return "".join(f"{stack} {count}\n"
+                   for stack, count in stacks.most_common())
+
+
+class SlowCallbackDetector:
+    """
+    Class detecting the callbacks blocking the event loop.
+
+    The loop updates a heartbeat periodically, a watchdog thread captures the
+    stack of the loop when the heartbeat is late, and the stall is reported
+    once the loop is free again.
+    """
+    _threshold: float
+    _report: Callable[[float, str], Awaitable]
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _thread_id: int
+    _last_beat: float
+    _running: bool
+
+    def __init__(self, threshold: float,
+                 report: Callable[[float, str], Awaitable]):
+        self._threshold = threshold
+        self._interval = threshold / 2
+        self._report = report
+        self._loop = None
+        self._thread_id = 0
+        self._last_beat = monotonic()
+        self._running = False
+
+    def start(self) -> None:
+        """
+        Starts the detector, to be called from the event loop
+
+        :returns:   None
+        :rtype:     None
+        """
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._running = True
+        self._beat()
+        threading.Thread(target=self._watch, name="slow-callback-detector",
+                         daemon=True).start()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _beat(self) -> None:
+        self._last_beat = monotonic()
+        if self._running and self._loop is not None:
+            self._loop.call_later(self._interval, self._beat)
+
+    def _watch(self) -> None:
+        stall_start: Optional[float] = None
+        stack = ""
+        while self._running:
+            sleep(self._interval)
+            late = monotonic() - self._last_beat - self._interval
+            if stall_start is None and late > self._threshold:
+                stall_start = self._last_beat + self._interval
+                frame = sys._current_frames().get(  # pylint: disable=W0212
+                    self._thread_id)
+                stack = "".join(traceback.format_stack(
+                    frame, MAX_STACK_DEPTH)) if frame is not None else ""
+                del frame
+            elif stall_start is not None and late < self._interval:
+                duration = self._last_beat - stall_start
+                stall_start = None
+                assert self._loop is not None
+                self._loop.call_soon_threadsafe(
+                    asyncio.ensure_future, self._report(duration, stack))
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-20 10:12:41
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-20 10:12:41
+
+"""Module routing the ingested messages to their destinations"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+WILDCARD = "*"
+LEVELS = (b"LOG", b"WARN", b"ERROR", b"REPORT")
+# Channel used when the channel of a level is not set or does not exist
+FALL_BACK = {"report": "log",
+             "error": "warn",
+             "warn": "log"}
+
+
+class Rule:
+    """
+    Class representing a routing rule of the config file
+    """
+    # pylint: disable=R0903
+    source: Optional[str]
+    level: Optional[str]
+    prefix: Optional[str]
+    regex: Optional[re.Pattern]
+    destinations: Tuple[str, ...]
+
+    def __init__(self, rule: dict):
+        source = rule.get("source", WILDCARD)
+        level = rule.get("level", WILDCARD)
+        self.source = None if source in (None, "", WILDCARD) else str(source)
+        self.level = (None if level in (None, "", WILDCARD)
+                      else str(level).upper())
+
+        prefix = rule.get("prefix")
+        regex = rule.get("regex")
+        if prefix is not None and regex is not None:
+            raise ValueError("A routing rule can not have both "
+                             + "a prefix and a regex.")
+        self.prefix = None if prefix is None else str(prefix)
+        try:
+            self.regex = None if regex is None else re.compile(str(regex))
+        except re.error as error:
+            raise ValueError(f"Invalid routing regex {regex!r}: "
+                             + str(error)) from error
+
+        destinations = rule.get("to", [])
+        if isinstance(destinations, (str, int)):
+            destinations = [destinations]
+        if len(destinations) == 0:
+            raise ValueError("A routing rule needs at least one destination.")
+        self.destinations = tuple(str(dest) for dest in destinations)
+
+    def applies_to(self, source: Optional[str], level: str) -> bool:
+        """
+        Determines if the rule can apply to a message of this source and level
+
+        :param      source:  The source, None for an unknown one
+        :type       source:  Optional[str]
+        :param      level:   The level
+        :type       level:   str
+
+        :returns:   True if the rule can apply, False otherwise
+        :rtype:     bool
+        """
+        return ((self.source is None or self.source == source)
+                and (self.level is None or self.level == level))
+
+    def matches(self, body: str) -> bool:
+        """
+        Determines if the body of a message matches the rule
+
+        :param      body:  The body
+        :type       body:  str
+
+        :returns:   True if it matches, False otherwise
+        :rtype:     bool
+        """
+        if self.prefix is not None:
+            return body.startswith(self.prefix)
+        if self.regex is not None:
+            return self.regex.search(body) is not None
+        return True
+
+
+class Matcher:
+    """
+    Class finding the first of a list of rules matching a body.
+
+    The prefixes are stored in a trie, each node keeping the first rule whose
+    prefix ends there, so all of them are matched in a walk of the beginning
+    of the body. The regexes that can be combined, without groups nor global
+    flags, are joined in an alternation marked by named groups. Its search
+    finds the leftmost match, and is repeated on the rules before the one
+    found until none of them matches. The other regexes are searched one by
+    one.
+    """
+    _rules: List[Rule]
+    _default: Optional[int]
+    _trie: Dict[Optional[str], Any]
+    _scanned: List[int]
+    _combined: List[int]
+    _alternations: Dict[int, re.Pattern]
+
+    def __init__(self, rules: List[Rule]):
+        self._rules = rules
+        self._default = None
+        self._trie = {}
+        self._scanned = []
+        self._combined = []
+        self._alternations = {}
+        for index, rule in enumerate(rules):
+            if rule.prefix is not None:
+                node = self._trie
+                for char in rule.prefix:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, index)
+            elif rule.regex is not None:
+                if (rule.regex.groups == 0
+                        and rule.regex.flags == re.UNICODE):
+                    self._combined.append(index)
+                else:
+                    # Wrapped in an alternation, backreferences would be
+                    # renumbered and global flags rejected
+                    self._scanned.append(index)
+            elif self._default is None:
+                self._default = index
+
+    def _alternation(self, count: int) -> re.Pattern:
+        # Alternation of the first count combined regexes
+        try:
+            return self._alternations[count]
+        except KeyError:
+            pass
+        # The groups are put after the regexes, so the regex module still
+        # sees their literal beginnings and factors the common ones
+        alternation = re.compile("|".join(
+            f"(?:{self._rules[index].regex.pattern})(?P<r{position}>)"  # type: ignore
+            for position, index in enumerate(self._combined[:count])))
+        self._alternations[count] = alternation
+        return alternation
+
+    def first(self, body: str) -> Optional[Rule]:
+        """
+        Finds the first rule matching a body
+
+        :param      body:  The body
+        :type       body:  str
+
+        :returns:   The rule, None if no rule matches
+        :rtype:     Optional[Rule]
+        """
+        best = self._default
+        node = self._trie
+        for char in body:
+            index = node.get(None)
+            if index is not None and (best is None or index < best):
+                best = index
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            index = node.get(None)
+            if index is not None and (best is None or index < best):
+                best = index
+
+        for index in self._scanned:
+            if best is not None and index >= best:
+                break
+            if self._rules[index].matches(body):
+                best = index
+                break
+
+        count = (len(self._combined) if best is None
+                 else bisect_left(self._combined, best))
+        while count > 0:
+            match = self._alternation(count).search(body)
+            if match is None:
+                break
+            count = int(match.lastgroup[1:])         # type: ignore
+            best = self._combined[count]
+
+        return None if best is None else self._rules[best]
+
+
+class Router:
+    """
+    Class routing messages with the rules of the config file.
+
+    The regexes are compiled, and the candidate rules of each (source, level)
+    couple selected and gathered in a Matcher, when the rules are loaded.
+    """
+    _rules: List[Rule]
+    _sources: frozenset
+    _candidates: Dict[Tuple[Optional[str], str], Matcher]
+
+    def __init__(self, rules: Optional[List[dict]] = None):
+        # Raises ValueError on an invalid rule, so a bad config fails at load
+        self._rules = [Rule(rule) for rule in (rules or [])]
+        self._sources = frozenset(rule.source for rule in self._rules
+                                  if rule.source is not None)
+        self._candidates = {}
+        for source in self._sources | {None}:
+            for level in LEVELS:
+                self._candidates[(source, level.decode("utf-8"))] = \
+                    Matcher(self._select(source, level.decode("utf-8")))
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def _select(self, source: Optional[str], level: str) -> List[Rule]:
+        rules = []
+        for rule in self._rules:
+            if not rule.applies_to(source, level):
+                continue
+            rules.append(rule)
+            if rule.prefix is None and rule.regex is None:
+                # Nothing after a catch-all rule can ever be reached
+                break
+        return rules
+
+    def route(self, level: str, body: str,
+              source: Optional[str] = None) -> Tuple[str, ...]:
+        """
+        Finds the destinations of a message
+
+        :param      level:   The level (LOG, WARN, ...)
+        :type       level:   str
+        :param      body:    The body of the message
+        :type       body:    str
+        :param      source:  The source of the message
+        :type       source:  Optional[str]
+
+        :returns:   The destinations of the first matching rule,
+                    empty if no rule matches
+        :rtype:     Tuple[str, ...]
+        """
+        if source not in self._sources:
+            source = None
+        level = level.upper()
+        try:
+            matcher = self._candidates[(source, level)]
+        except KeyError:
+            matcher = self._candidates[(source, level)] = \
+                Matcher(self._select(source, level))
+        rule = matcher.first(body)
+        return () if rule is None else rule.destinations
+
+
+def parse_destination(destination: Union[str, int]) -> Union[int, str]:
+    """
+    Parses a destination of a routing rule
+
+    :param      destination:  The destination
+    :type       destination:  Union[str, int]
+
+    :returns:   The id of the channel or thread, or the name of a channel of
+                the config file
+    :rtype:     Union[int, str]
+    """
+    destination = str(destination)
+    if destination.isdigit():
+        return int(destination)
+    return destination
+
+
+def parse_message(msg: List[bytes]
+                  ) -> Optional[Tuple[str, str, Optional[str]]]:
+    """
+    Parses a message received on the socket, [LEVEL, BODY] or
+    [LEVEL, SOURCE, BODY]
+
+    :param      msg:  The message
+    :type       msg:  List[bytes]
+
+    :returns:   The level, the body and the source, None if the message is
+                invalid
+    :rtype:     Optional[Tuple[str, str, Optional[str]]]
+    """
+    if len(msg) not in (2, 3) or msg[0] not in LEVELS:
+        return None
+    source = msg[1].decode("utf-8") if len(msg) == 3 else None
+    return msg[0].decode("utf-8"), msg[-1].decode("utf-8"), source
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-28 17:02:44
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-28 17:02:44
+
+"""Module of the client of ssh-maintainer"""
+
+from __future__ import annotations
+
+import asyncio
+from enum import Enum, auto
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Any, Optional
+
+import zmq
+import zmq.asyncio
+from zmq.asyncio import Socket
+
+from .ssh_keys import loads_async
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+
+class MaintainerUnavailable(Exception):
+    """
+    Raised when ssh-maintainer does not answer, or is known to be down
+    """
+
+
+class BreakerState(Enum):
+    CLOSED = auto()
+    OPEN = auto()
+    HALF_OPEN = auto()
+
+
+class SshMaintainerClient:
+    """
+    Class sending the requests to ssh-maintainer.
+
+    Each request has a deadline, after which the REQ socket is torn down and
+    reconnected on the next request. After too many failures in a row the
+    circuit breaker opens and the requests fail fast, until a single probe
+    request is let through once the cooldown is over.
+    """
+    # pylint: disable=R0902
+    _bot: Bot
+    _socket: Optional[Socket]
+    _lock: asyncio.Lock
+    _state: BreakerState
+    _failures: int
+    _opened_at: float
+
+    def __init__(self, bot: Bot):
+        self._bot = bot
+        self._socket = None
+        self._lock = asyncio.Lock()
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> BreakerState:
+        return self._state
+
+    def _param(self, name: str, default: float) -> float:
+        value = self._bot.get_param("sockets.ssh." + name)
+        return default if value is None or value == "" else float(value)
+
+    def _connect(self) -> Socket:
+        if self._socket is None:
+            context = zmq.asyncio.Context()                 # pylint: disable=E0110
+            self._socket = context.socket(zmq.REQ)
+            self._socket.connect(
+                "tcp://" + self._bot.get_param("sockets.ssh.ip")
+                + ":" + str(self._bot.get_param("sockets.ssh.port")))
+        return self._socket
+
+    def close(self) -> None:
+        """
+        Closes the socket, the next request reconnects
+
+        :returns:   None
+        :rtype:     None
+        """
+        if self._socket is not None:
+            self._socket.close(linger=0)
+            self._socket = None
+
+    def _before_request(self) -> None:
+        if self._state == BreakerState.CLOSED:
+            return
+        if (self._state == BreakerState.OPEN
+                and monotonic() - self._opened_at
+                >= self._param("cooldown", 30)):
+            self._state = BreakerState.HALF_OPEN
+            return
+        raise MaintainerUnavailable(
+            "ssh-maintainer is unavailable, try again later.")
+
+    def _success(self) -> None:
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+
+    def _failure(self) -> None:
+        self._failures += 1
+        if self._state == BreakerState.OPEN:
+            # A request queued before the opening, the cooldown goes on
+            return
+        if (self._state == BreakerState.HALF_OPEN
+                or self._failures >= self._param("failure_threshold", 3)):
+            self._state = BreakerState.OPEN
+            self._opened_at = monotonic()
+
+    async def _exchange(self, request: Any) -> Any:
+        async with self._lock:
+            # The breaker may have opened while the request was queued
+            if self._state == BreakerState.OPEN:
+                raise MaintainerUnavailable(
+                    "ssh-maintainer is unavailable, try again later.")
+            socket = self._connect()
+            try:
+                await socket.send_pyobj(request)
+                payload = await socket.recv()
+            except BaseException:
+                # The REQ socket is stuck waiting for its answer
+                self.close()
+                raise
+        return await loads_async(payload)
+
+    async def request(self, request: Any, name: str) -> Any:
+        """
+        Sends a request to ssh-maintainer and waits for its answer
+
+        :param      request:  The request
+        :type       request:  Any
+        :param      name:     The name of the request, for the metrics
+        :type       name:     str
+
+        :returns:   The answer
+        :rtype:     Any
+
+        :raises     MaintainerUnavailable:  When ssh-maintainer did not answer
+                                            before the deadline, or is known
+                                            to be down
+        """
+        self._before_request()
+        start = perf_counter()
+        answered = False
+        try:
+            # A single deadline, the time spent queued behind the other
+            # requests included
+            answer = await asyncio.wait_for(self._exchange(request),
+                                            self._param("timeout", 5))
+            answered = True
+        except (asyncio.TimeoutError, zmq.ZMQError) as error:
+            self._failure()
+            raise MaintainerUnavailable(
+                "ssh-maintainer did not answer in time.") from error
+        finally:
+            if not answered and self._state == BreakerState.HALF_OPEN:
+                # The probe was cancelled or failed otherwise, without a
+                # verdict the breaker would stay half open for good
+                self._state = BreakerState.OPEN
+                self._opened_at = monotonic()
+        self._success()
+        self._bot.metrics.ssh_latency.observe(perf_counter() - start, name)
+        return answer
@@ -6,11 +6,63 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
+import pickle
+from bisect import bisect_left, insort
 from collections.abc import MutableMapping
-from typing import Optional, Union, Dict, List
+from functools import partial
+from typing import Any, Callable, Optional, Union, Dict, List, Tuple
 from enum import Enum, auto
 
 
+# Trees with fewer keys, or files and pickles smaller than this, are handled
+# inline on the event loop, bigger ones in a worker thread
+OFFLOAD_KEYS = 2000
+OFFLOAD_BYTES = 256 * 1024
+
+
+def _offload(weight: int, threshold: int,
+             function: Callable, *args) -> asyncio.Future:
+    loop = asyncio.get_running_loop()
+    if weight < threshold:
+        future = loop.create_future()
+        try:
+            future.set_result(function(*args))
+        except Exception as error:                  # pylint: disable=W0703
+            future.set_exception(error)
+        return future
+    return loop.run_in_executor(None, partial(function, *args))
+
+
+def loads_async(payload: bytes) -> asyncio.Future:
+    """
+    Unpickles a payload, in a worker thread if it is big
+
+    :param      payload:  The payload
+    :type       payload:  bytes
+
+    :returns:   The future of the unpickled object
+    :rtype:     asyncio.Future
+    """
+    return _offload(len(payload), OFFLOAD_BYTES, pickle.loads, payload)
+
+
+def dumps_async(obj: Any, weight: int = 0) -> asyncio.Future:
+    """
+    Pickles an object, in a worker thread if it is big
+
+    :param      obj:     The object
+    :type       obj:     Any
+    :param      weight:  The number of keys in the object
+    :type       weight:  int
+
+    :returns:   The future of the payload
+    :rtype:     asyncio.Future
+    """
+    return _offload(weight, OFFLOAD_KEYS, pickle.dumps, obj)
+
+
 class KeyMode(Enum):
     DSA = auto()
     ECDSA = auto()
@@ -64,6 +116,16 @@ class SshKey:
     def __str__(self) -> str:
         return self.__repr__()
 
+    def short(self) -> str:
+        """
+        Short form of the key, with only the end of the key itself
+
+        :returns:   The short form
+        :rtype:     str
+        """
+        return (str(self._mode) + " …" + self._key[-12:]
+                + ((" " + self._comment) if self._comment is not None else ""))
+
     @classmethod
     def convert(cls, value: str) -> SshKey:
         args = value.split(" ")
@@ -116,8 +178,14 @@ except ModuleNotFoundError:
     pass
 
 
+def _weight(value: Union[SshKeyDict, SshKey]) -> int:
+    return value.weight() if isinstance(value, SshKeyDict) else 1
+
+
 class SshKeyDict(MutableMapping):
     _content: Dict[str, Union[SshKeyDict, SshKey]]
+    # Class level default, for the pickles of older versions
+    _size: Optional[int] = None
 
     def __init__(self, dic: Dict[str, Union[Dict, SshKey]]):
         self._content = {}
@@ -129,6 +197,7 @@ class SshKeyDict(MutableMapping):
                 self._content[key] = value
             else:
                 self._content[key] = SshKeyDict(value)
+        self._size = sum(_weight(value) for value in self._content.values())
 
     def __contains__(self, full_key: str) -> bool:
         if full_key == "":
@@ -155,10 +224,39 @@ class SshKeyDict(MutableMapping):
         return iter(self._content)
 
     def __setitem__(self, key: str, value: Union[SshKey, SshKeyDict]):
+        old_value = self._content.get(key)
         self._content[key] = value
+        self._resize(_weight(value)
+                     - (0 if old_value is None else _weight(old_value)))
 
     def __delitem__(self, key: str) -> None:
-        self._content.__delitem__(key)
+        self._resize(-_weight(self._content.pop(key)))
+
+    def _resize(self, delta: int) -> None:
+        if self._size is not None:
+            self._size += delta
+
+    def weight(self) -> int:
+        """
+        Number of keys of the tree, kept up to date as the tree is modified,
+        so deciding how to handle a tree does not walk it
+
+        :returns:   The number of keys
+        :rtype:     int
+        """
+        if self._size is None:
+            # Pickles of older versions
+            self._size = sum(_weight(value)
+                             for value in self._content.values())
+        return self._size
+
+    def get_key(self, full_key: str) -> Optional[SshKey]:
+        node: Union[SshKeyDict, SshKey] = self
+        for key in full_key.split("/"):
+            if not isinstance(node, SshKeyDict) or key not in node._content:
+                return None
+            node = node._content[key]
+        return node if isinstance(node, SshKey) else None
 
     @classmethod
     def open(cls, filename: str = "/authorized_key") -> SshKeyDict:
@@ -215,7 +313,10 @@ class SshKeyDict(MutableMapping):
                 old_value = self[key]
                 if isinstance(value, SshKeyDict):
                     if isinstance(old_value, SshKeyDict):
-                        if not old_value.add(value):
+                        before = old_value.weight()
+                        added = old_value.add(value)
+                        self._resize(old_value.weight() - before)
+                        if not added:
                             return False
                     else:
                         return False
@@ -240,6 +341,7 @@ class SshKeyDict(MutableMapping):
             return False
         if isinstance(value, SshKeyDict):
             if value.remove(key_name[len(key_begin)+1:]):
+                self._resize(-1)
                 if len(value) == 0:
                     del self[key_begin]
                 return True
@@ -296,3 +398,121 @@ class SshKeyDict(MutableMapping):
                 for key_name in value.list_key():
                     ret.append(key + "/" + key_name)
         return ret
+
+    @classmethod
+    def open_async(cls, filename: str = "/authorized_key") -> asyncio.Future:
+        """
+        Asynchronous variant of open, in a worker thread for big files
+
+        :param      filename:  The filename
+        :type       filename:  str
+
+        :returns:   The future of the tree
+        :rtype:     asyncio.Future
+        """
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            size = 0
+        return _offload(size, OFFLOAD_BYTES, cls.open, filename)
+
+    def write_async(self, filename: str = "/authorized_key"
+                    ) -> asyncio.Future:
+        """
+        Asynchronous variant of write, in a worker thread for big trees
+
+        :param      filename:  The filename
+        :type       filename:  str
+
+        :returns:   The future of the writing
+        :rtype:     asyncio.Future
+        """
+        return _offload(self.weight(), OFFLOAD_KEYS, self.write, filename)
+
+    def repr_async(self) -> asyncio.Future:
+        """
+        Asynchronous variant of repr, in a worker thread for big trees
+
+        :returns:   The future of the representation
+        :rtype:     asyncio.Future
+        """
+        return _offload(self.weight(), OFFLOAD_KEYS, self.__repr__)
+
+    def diff_async(self, old_dict: SshKeyDict) -> asyncio.Future:
+        """
+        Asynchronous variant of diff, in a worker thread for big trees
+
+        :param      old_dict:  The old dictionary
+        :type       old_dict:  SshKeyDict
+
+        :returns:   The future of the difference
+        :rtype:     asyncio.Future
+        """
+        return _offload(max(self.weight(), old_dict.weight()), OFFLOAD_KEYS,
+                        self.diff, old_dict)
+
+
+class SshKeyIndex:
+    """
+    Sorted index of the paths of a SshKeyDict, for listings and prefix lookups
+    """
+    _tree: SshKeyDict
+    _paths: List[str]
+
+    def __init__(self, tree: SshKeyDict):
+        self._tree = tree
+        self._paths = sorted(tree.list_key())
+
+    @classmethod
+    def build_async(cls, tree: SshKeyDict) -> asyncio.Future:
+        """
+        Builds the index of a tree, in a worker thread for big trees
+
+        :param      tree:  The tree, not modified until the index is built
+        :type       tree:  SshKeyDict
+
+        :returns:   The future of the index
+        :rtype:     asyncio.Future
+        """
+        return _offload(tree.weight(), OFFLOAD_KEYS, cls, tree)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, path: str) -> bool:
+        i = bisect_left(self._paths, path)
+        return i < len(self._paths) and self._paths[i] == path
+
+    @property
+    def tree(self) -> SshKeyDict:
+        return self._tree
+
+    def prefix_range(self, prefix: str = "") -> Tuple[int, int]:
+        """
+        Gets the range of the paths starting with the prefix
+
+        :param      prefix:  The prefix
+        :type       prefix:  str
+
+        :returns:   The start (included) and end (excluded) of the range
+        :rtype:     Tuple[int, int]
+        """
+        if prefix == "":
+            return 0, len(self._paths)
+        return (bisect_left(self._paths, prefix),
+                bisect_left(self._paths, prefix + "\U0010ffff"))
+
+    def paths(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        return self._paths[start:stop]
+
+    def get(self, path: str) -> Optional[SshKey]:
+        return self._tree.get_key(path)
+
+    def insert(self, path: str) -> None:
+        if path not in self:
+            insort(self._paths, path)
+
+    def discard(self, path: str) -> None:
+        i = bisect_left(self._paths, path)
+        if i < len(self._paths) and self._paths[i] == path:
+            del self._paths[i]
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# @Author: Ultraxime
+# @Date:   2023-03-29 13:51:07
+# @Last Modified by:   Ultraxime
+# @Last Modified time: 2023-03-29 13:51:07
+
+"""
+Module keeping a local mirror of the keys of ssh-maintainer.
+
+ssh-maintainer publishes every change of its keys on a PUB socket:
+    [b"EVENT", epoch, seq, pickle({"DEL": [key_name, ...], "ADD": SshKeyDict})]
+and periodically its current sequence number:
+    [b"HEARTBEAT", epoch, seq]
+and answers the request "SNAPSHOT" with
+    {"SNAPSHOT": SshKeyDict, "EPOCH": epoch, "SEQ": seq}.
+The epoch changes each time ssh-maintainer starts.
+
+The mirror has its own client, so its snapshots neither wait behind the
+commands nor trip their circuit breaker, and it backs off while the
+snapshots fail.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Optional
+
+import zmq
+import zmq.asyncio
+
+from .ssh_client import MaintainerUnavailable, SshMaintainerClient
+from .ssh_keys import SshKeyDict, SshKeyIndex, loads_async
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+
+class SshKeyMirror:
+    """
+    Class keeping a SshKeyDict in sync with the events of ssh-maintainer
+    """
+    # pylint: disable=R0902
+    _bot: Bot
+    _client: SshMaintainerClient
+    _tree: Optional[SshKeyDict]
+    _index: Optional[SshKeyIndex]
+    _epoch: bytes
+    _seq: int
+    _last_message: float
+    _task: Optional[asyncio.Task]
+    _failures: int
+    _retry_at: float
+
+    def __init__(self, bot: Bot):
+        self._bot = bot
+        self._client = SshMaintainerClient(bot)
+        self._tree = None
+        self._index = None
+        self._epoch = b""
+        self._seq = -1
+        self._last_message = 0.0
+        self._task = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def synced(self) -> bool:
+        """
+        Whether the mirror is in sync with ssh-maintainer
+
+        :returns:   True if in sync, False otherwise
+        :rtype:     bool
+        """
+        return (self._tree is not None
+                and monotonic() - self._last_message
+                < 3 * float(self._bot.get_param("sockets.ssh.heartbeat")))
+
+    @property
+    def tree(self) -> Optional[SshKeyDict]:
+        """
+        The keys, None if the mirror is not in sync
+
+        :returns:   The keys
+        :rtype:     Optional[SshKeyDict]
+        """
+        return self._tree if self.synced else None
+
+    @property
+    def index(self) -> Optional[SshKeyIndex]:
+        """
+        The sorted index of the keys, updated with each event, None if the
+        mirror is not in sync
+
+        :returns:   The index
+        :rtype:     Optional[SshKeyIndex]
+        """
+        return self._index if self.synced else None
+
+    def start(self) -> None:
+        """
+        Starts following ssh-maintainer, if it is not done yet
+
+        :returns:   None
+        :rtype:     None
+        """
+        port = self._bot.get_param("sockets.ssh.publish_port")
+        if (self._task is None or self._task.done()) \
+                and port is not None and port != "" \
+                and monotonic() >= self._retry_at:
+            self._task = asyncio.ensure_future(self._run(int(port)))
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._client.close()
+
+    def _backoff(self) -> float:
+        # Doubles with each failure in a row, up to the cooldown of the
+        # circuit breaker
+        self._failures += 1
+        heartbeat = float(self._bot.get_param("sockets.ssh.heartbeat"))
+        cooldown = self._bot.get_param("sockets.ssh.cooldown")
+        limit = max(heartbeat, 30.0 if cooldown is None or cooldown == ""
+                    else float(cooldown))
+        delay = min(heartbeat * 2 ** (self._failures - 1), limit)
+        self._retry_at = monotonic() + delay
+        return delay
+
+    async def _resync(self) -> None:
+        self._tree = None
+        answer: Any = await self._client.request("SNAPSHOT", "SNAPSHOT")
+        if not isinstance(answer, dict) \
+                or not isinstance(answer.get("SNAPSHOT"), SshKeyDict):
+            raise ValueError("ssh-maintainer does not support snapshots.")
+        self._epoch = str(answer["EPOCH"]).encode("utf-8")
+        self._seq = int(answer["SEQ"])
+        self._index = await SshKeyIndex.build_async(answer["SNAPSHOT"])
+        self._tree = answer["SNAPSHOT"]
+        self._last_message = monotonic()
+        self._failures = 0
+
+    def _apply(self, diff: dict) -> None:
+        assert self._tree is not None and self._index is not None
+        for key_name in diff["DEL"]:
+            self._tree.remove(key_name)
+            self._index.discard(key_name)
+        self._tree.add(diff["ADD"])
+        for key_name in diff["ADD"].list_key():
+            self._index.insert(key_name)
+
+    async def _run(self, port: int) -> None:
+        context = zmq.asyncio.Context()         # pylint: disable=E0110
+        socket = context.socket(zmq.SUB)
+        socket.setsockopt(zmq.SUBSCRIBE, b"")
+        socket.connect("tcp://" + self._bot.get_param("sockets.ssh.ip")
+                       + ":" + str(port))
+        heartbeat = float(self._bot.get_param("sockets.ssh.heartbeat"))
+        try:
+            while True:
+                if self._tree is None:
+                    try:
+                        await self._resync()
+                    except (MaintainerUnavailable, ValueError) as error:
+                        delay = self._backoff()
+                        print("Unable to mirror the ssh keys, retrying in "
+                              + f"{delay:g}s: {error}", file=sys.stderr)
+                        await asyncio.sleep(delay)
+                        continue
+
+                if not await socket.poll(heartbeat * 3000):
+                    # Silent publisher, the mirror may be missing events
+                    self._tree = None
+                    continue
+                msg = await socket.recv_multipart()
+                try:
+                    seq = int(msg[2])
+                except (IndexError, ValueError):
+                    print("Invalid message from ssh-maintainer",
+                          file=sys.stderr)
+                    continue
+                if msg[1] != self._epoch:
+                    # ssh-maintainer restarted
+                    self._tree = None
+                elif msg[0] == b"HEARTBEAT":
+                    if seq > self._seq:
+                        self._tree = None
+                    else:
+                        self._last_message = monotonic()
+                elif msg[0] == b"EVENT":
+                    if seq <= self._seq:
+                        # Already in the snapshot
+                        continue
+                    if seq != self._seq + 1:
+                        self._tree = None
+                        continue
+                    self._apply(await loads_async(msg[3]))
+                    self._seq = seq
+                    self._last_message = monotonic()
+        except (ValueError, IndexError, zmq.ZMQError) as error:
+            print(f"The mirror of the ssh keys stopped: {error}",
+                  file=sys.stderr)
+            self._tree = None
+            # Restarted by the next command, once the delay is over
+            self._backoff()
+        finally:
+            socket.close(linger=0)